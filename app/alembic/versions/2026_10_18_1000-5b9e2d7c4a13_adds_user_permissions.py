@@ -0,0 +1,42 @@
+"""Adds materialized User.permissions
+
+Revision ID: 5b9e2d7c4a13
+Revises: 1254e3bb5e04
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e2d7c4a13'
+down_revision: Union[str, None] = '1254e3bb5e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user',
+        sa.Column('permissions', sa.Integer(), server_default='0', nullable=False),
+    )
+    # backfill from the roles users already hold
+    op.execute(
+        '''
+        UPDATE "user" SET permissions = sub.permissions
+        FROM (
+            SELECT user_role.user_id, coalesce(bit_or(role.permissions), 0) AS permissions
+            FROM user_role JOIN role ON role.id = user_role.role_id
+            GROUP BY user_role.user_id
+        ) AS sub
+        WHERE "user".id = sub.user_id
+        '''
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'permissions')
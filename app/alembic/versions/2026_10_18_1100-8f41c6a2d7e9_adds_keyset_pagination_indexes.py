@@ -0,0 +1,29 @@
+"""Adds keyset pagination indexes
+
+Revision ID: 8f41c6a2d7e9
+Revises: 5b9e2d7c4a13
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41c6a2d7e9'
+down_revision: Union[str, None] = '5b9e2d7c4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_updated_at_id', 'user', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_role_updated_at_id', 'role', ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_role_updated_at_id', table_name='role')
+    op.drop_index('ix_user_updated_at_id', table_name='user')
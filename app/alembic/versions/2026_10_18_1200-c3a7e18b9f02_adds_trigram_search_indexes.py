@@ -0,0 +1,41 @@
+"""Adds trigram search indexes
+
+Revision ID: c3a7e18b9f02
+Revises: 8f41c6a2d7e9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # noqa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7e18b9f02'
+down_revision: Union[str, None] = '8f41c6a2d7e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_user_name_trgm', 'user', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_role_name_trgm', 'role', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_role_desc_trgm', 'role', ['desc'],
+        postgresql_using='gin', postgresql_ops={'desc': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_role_desc_trgm', table_name='role')
+    op.drop_index('ix_role_name_trgm', table_name='role')
+    op.drop_index('ix_user_name_trgm', table_name='user')
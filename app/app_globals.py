@@ -1,8 +1,80 @@
-from slowapi import Limiter
 from settings import settings
+from utils.captcha import CaptchaPool
+from utils.database import create_db_engine, db
+from utils.metrics import RuntimeMonitor
+from utils.principal import PrincipalCache, SecurityVersions
+from utils.qr_code import QRCodeCache
+from utils.rate_limit import RateLimiter
 from utils.redis_util import RedisUtil
-from slowapi.util import get_remote_address
+from utils.replica import ReplicaRouter
+from utils.tiered_cache import TieredCache
+from utils.worker_pool import BoundedExecutor
 
 
-redis_util = RedisUtil(settings.REDIS_URI)
-limiter = Limiter(key_func=get_remote_address)
+engine = create_db_engine(settings.POSTGRES_DB_URI)
+db.bind(engine)
+redis_util = RedisUtil(
+    settings.REDIS_URI,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+)
+replica_router = ReplicaRouter(
+    [create_db_engine(uri) for uri in settings.POSTGRES_REPLICA_URIS],
+    redis_util,
+    balancing=settings.REPLICA_BALANCING,
+    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+)
+rate_limiter = RateLimiter(
+    redis_util,
+    batch_size=settings.RATE_LIMIT_BATCH_SIZE,
+    batch_ttl=settings.RATE_LIMIT_BATCH_TTL_SECONDS,
+)
+tiered_cache = TieredCache(
+    redis_util,
+    maxsize=settings.DATA_CACHE_SIZE,
+    ttl=settings.DATA_CACHE_TTL_SECONDS,
+    redis_ttl=settings.DATA_CACHE_REDIS_TTL_SECONDS,
+)
+principal_cache = PrincipalCache(
+    redis_util,
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    redis_ttl=settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+)
+security_versions = SecurityVersions(
+    redis_util,
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.SECURITY_VERSION_CACHE_TTL_SECONDS,
+    redis_ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+pwd_hash_pool = BoundedExecutor(
+    "pwd_hash",
+    max_workers=settings.PWD_HASH_WORKERS,
+    max_queue=settings.PWD_HASH_QUEUE_SIZE,
+)
+render_pool = BoundedExecutor(
+    "render",
+    max_workers=settings.RENDER_WORKERS,
+    max_queue=settings.RENDER_QUEUE_SIZE,
+)
+captcha_pool = CaptchaPool(render_pool, size=settings.CAPTCHA_POOL_SIZE)
+runtime_monitor = RuntimeMonitor(
+    settings.METRICS_SAMPLE_INTERVAL_SECONDS,
+    engines={
+        "primary": engine,
+        **{
+            f"replica-{index}": replica
+            for index, replica in enumerate(replica_router.engines)
+        },
+    },
+    worker_pools={"pwd_hash": pwd_hash_pool, "render": render_pool},
+    captcha_pool=captcha_pool,
+)
+qr_code_cache = QRCodeCache(
+    render_pool,
+    redis_util,
+    maxsize=settings.QR_CODE_CACHE_SIZE,
+    redis_ttl=settings.QR_CODE_CACHE_REDIS_TTL_SECONDS,
+)
@@ -0,0 +1,161 @@
+"""
+Run a mixed workload through `DBSessionMiddleware`, against a middleware that
+opens every request's session up front and closes it once the body is sent,
+as the former `SQLAlchemyMiddleware` did, and report sessions opened and
+connections checked out of the pool:
+
+    cd app && uv run --group dev python -m benchmarks.db_sessions
+
+It uses SQLite through aiosqlite, from the `dev` group, instead of postgres.
+"""
+
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.database import DBSessionMiddleware, InstrumentedQueuePool, _slot, db
+from utils.logger import logger
+
+REQUESTS = 2000
+CONCURRENCY = 50
+# share of requests by path
+WORKLOAD = {"/health": 0.3, "/cached": 0.3, "/query": 0.3, "/export": 0.1}
+
+
+class EagerSessionMiddleware:
+    """A session for every request, closed only after the body has been sent."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        slot = db._open_scope()
+        slot.get()
+        token = _slot.set(slot)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await slot.close()
+            _slot.reset(token)
+
+
+def build_app(middleware: type) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    @app.get("/cached")
+    async def cached():
+        # e.g. served by the tiered cache, or an ETag match
+        return {"items": list(range(20))}
+
+    @app.get("/query")
+    async def query():
+        return {"items": (await db.session.execute(text("SELECT 1"))).scalars().all()}
+
+    @app.get("/export")
+    async def export():
+        rows = (await db.session.execute(text("SELECT 1"))).scalars().all()
+
+        async def body():
+            # a slow client, reading the body a chunk at a time
+            for _ in range(5):
+                await asyncio.sleep(0.002)
+                yield repr(rows).encode()
+
+        return StreamingResponse(body())
+
+    app.add_middleware(middleware)
+    return app
+
+
+def watch_pool(engine: AsyncEngine) -> dict:
+    stats = {"checkouts": 0, "held_seconds": 0.0, "peak_checked_out": 0}
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats["checkouts"] += 1
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        stats["peak_checked_out"] = max(
+            stats["peak_checked_out"], engine.pool.checkedout()
+        )
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        if (
+            checked_out_at := connection_record.info.pop("checked_out_at", None)
+        ) is not None:
+            stats["held_seconds"] += time.perf_counter() - checked_out_at
+
+    return stats
+
+
+async def run(middleware: type, paths: list[str], database: Path) -> dict:
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{database}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=5,
+        max_overflow=5,
+    )
+    db.bind(engine)
+    pool_stats = watch_pool(engine)
+    before = db.stats()
+
+    transport = httpx.ASGITransport(app=build_app(middleware))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def hit(path: str):
+            async with semaphore:
+                (await client.get(path)).raise_for_status()
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(hit(path) for path in paths))
+        took = time.perf_counter() - started_at
+
+    after = db.stats()
+    await engine.dispose()
+    return {
+        "sessions_opened": after["opened"] - before["opened"],
+        "sessions_avoided": after["avoided"] - before["avoided"],
+        **pool_stats,
+        "req_per_second": REQUESTS / took,
+    }
+
+
+async def main():
+    random.seed(0)
+    paths = random.choices(list(WORKLOAD), weights=list(WORKLOAD.values()), k=REQUESTS)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, middleware in (
+            ("eager", EagerSessionMiddleware),
+            ("lazy", DBSessionMiddleware),
+        ):
+            stats = await run(middleware, paths, Path(directory) / f"{name}.db")
+            print(
+                f"{name:<6} sessions opened {stats['sessions_opened']:>5}, "
+                f"avoided {stats['sessions_avoided']:>5} | "
+                f"checkouts {stats['checkouts']:>5}, "
+                f"connections held {stats['held_seconds']:6.2f}s in total, "
+                f"at most {stats['peak_checked_out']} at once | "
+                f"{stats['req_per_second']:6.0f} req/s"
+            )
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Requests per second of an app wrapped by the former `@app.middleware("http")`
+request wrapper, against one wrapped by `RequestContextMiddleware`, in process
+so that only the middleware differs:
+
+    cd app && uv run python -m benchmarks.request_middleware
+"""
+
+import asyncio
+import time
+from uuid import uuid4
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from context_vars import request_context_var
+from models import RequestContext
+from utils.access_log import log_access, redact_headers
+from utils.logger import logger
+from utils.middlewares import LOG_REQUEST_PREFIX, RequestContextMiddleware
+
+REQUESTS = 5000
+CONCURRENCY = 50
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"trace_id": request_context_var.get().trace_id}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(b"chunk" for _ in range(20))
+
+    return app
+
+
+def before_app() -> FastAPI:
+    app = build_app()
+
+    @app.middleware("http")
+    async def generic_request(request: Request, call_next):
+        start_time = time.perf_counter()
+        trace_id = str(uuid4())
+        request.state.trace_id = trace_id
+        request_context_var.set(RequestContext(trace_id=trace_id))
+
+        with logger.contextualize(trace_id=request.state.trace_id):
+            logger.opt(lazy=True).debug(
+                f"{LOG_REQUEST_PREFIX} Headers: {{headers}}.",
+                headers=lambda: redact_headers(request.headers),
+            )
+            response = await call_next(request)
+            process_time = round((time.perf_counter() - start_time) * 1000, 2)
+            log_access(
+                request.method, request.url.path, response.status_code, process_time
+            )
+            response.headers["x-time-taken"] = str(process_time)
+            response.headers["x-trace-id"] = request.state.trace_id
+            return response
+
+    return app
+
+
+def after_app() -> FastAPI:
+    app = build_app()
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def throughput(app: FastAPI, path: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def hit():
+            async with semaphore:
+                (await client.get(path)).raise_for_status()
+
+        await asyncio.gather(*(hit() for _ in range(100)))  # warm up
+        started_at = time.perf_counter()
+        await asyncio.gather(*(hit() for _ in range(REQUESTS)))
+        return REQUESTS / (time.perf_counter() - started_at)
+
+
+async def main():
+    for path in ("/ping", "/stream"):
+        before = await throughput(before_app(), path)
+        after = await throughput(after_app(), path)
+        print(
+            f"{path:<8} before {before:7.0f} req/s, after {after:7.0f} req/s, "
+            f"{after / before - 1:+.0%}"
+        )
+
+
+if __name__ == "__main__":
+    logger.remove()  # the access log would only measure the sink
+    asyncio.run(main())
@@ -45,17 +45,23 @@ def gen_lock_id():
     return int(datetime.now().timestamp())
 
 
-def init():
+def create_sync_session() -> Session:
     engine = create_engine(
         str(settings.POSTGRES_DB_URI_SYNC),
         echo=settings.DATABASE_ECHO,
-        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        # a single session at startup
+        pool_size=1,
+        max_overflow=0,
     )
     SessionLocal = sessionmaker(
         autocommit=False,
         autoflush=False,
         bind=engine,
     )
-    with SessionLocal() as session:
+    return SessionLocal()
+
+
+def init():
+    with create_sync_session() as session:
         with advisory_lock(session, gen_lock_id()):
             init_user_role(session)
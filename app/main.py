@@ -1,25 +1,32 @@
 from http import HTTPStatus
-import json
-import time
-from uuid import uuid4
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from fastapi_async_sqlalchemy import SQLAlchemyMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from models import RequestContext
 from models.environment import Environment
 from models.states import StateCode, InternalError
-from sqlalchemy import AsyncAdaptedQueuePool
-from slowapi.errors import RateLimitExceeded
 
-from utils.response import make_response
+from utils.response import make_json_response
 from settings import settings
 from utils.logger import setup_logger, logger
+from utils.access_log import redact_headers
+from utils.database import DBSessionMiddleware
+from utils.metrics import MetricsMiddleware, metrics_endpoint
+from utils.middlewares import LOG_REQUEST_PREFIX, RequestContextMiddleware
+from utils.profiling import ProfilerMiddleware
 from routers import base_router
-from context_vars import request_context_var
-from app_globals import limiter
+from app_globals import (
+    captcha_pool,
+    engine,
+    pwd_hash_pool,
+    rate_limiter,
+    redis_util,
+    render_pool,
+    replica_router,
+    runtime_monitor,
+    tiered_cache,
+)
+from services.user_import import stop_user_imports
 from init_db import init as init_db
 
 app = (
@@ -28,25 +35,34 @@ app = (
     else FastAPI()
 )
 app.include_router(base_router)
-LOG_REQUEST_PREFIX = f"{'-'*4}>"
-LOG_RESPONSE_PREFIX = f"<{'-'*4}"
-app.state.limiter = limiter
+if settings.METRICS_ENABLED:
+    # outside `API_PREFIX`, where scrapers look for it
+    app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
+app.state.rate_limiter = rate_limiter
+app.state.replica_router = replica_router
 
 
 # startup events
 app.add_event_handler("startup", setup_logger)
 app.add_event_handler("startup", init_db)
+app.add_event_handler("startup", captcha_pool.start)
+app.add_event_handler("startup", tiered_cache.start)
+if settings.METRICS_ENABLED:
+    app.add_event_handler("startup", runtime_monitor.start)
+
+# shutdown events
+app.add_event_handler("shutdown", captcha_pool.stop)
+app.add_event_handler("shutdown", tiered_cache.stop)
+app.add_event_handler("shutdown", stop_user_imports)
+app.add_event_handler("shutdown", runtime_monitor.stop)
+app.add_event_handler("shutdown", pwd_hash_pool.shutdown)
+app.add_event_handler("shutdown", render_pool.shutdown)
+app.add_event_handler("shutdown", redis_util.close)
+app.add_event_handler("shutdown", engine.dispose)
+app.add_event_handler("shutdown", replica_router.dispose)
 
 # middlewares
-app.add_middleware(
-    SQLAlchemyMiddleware,
-    db_url=str(settings.POSTGRES_DB_URI),
-    engine_args={
-        "echo": settings.DATABASE_ECHO,
-        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
-        "poolclass": AsyncAdaptedQueuePool,
-    },
-)
+app.add_middleware(DBSessionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -54,31 +70,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-
-@app.middleware("http")
-async def generic_request(request: Request, call_next):
-    start_time = time.time()
-    trace_id = str(uuid4())
-    request.state.trace_id = trace_id
-    request_context_var.set(RequestContext(trace_id=trace_id))
-
-    with logger.contextualize(trace_id=request.state.trace_id):
-        logger.info(
-            f"Request: {request.method} {request.url} received. \n"
-            f"{LOG_REQUEST_PREFIX} Headers: {request.headers}."
-        )
-        response = await call_next(request)
-        logger.debug(f"Response: {response}.")
-        process_time = round((time.time() - start_time) * 1000, 2)
-        logger.info(
-            f"Request: {request.method} {request.url} handled. \n"
-            f"{LOG_RESPONSE_PREFIX} Status code: {response.status_code}\n"
-            f"{LOG_RESPONSE_PREFIX} Time taken: {process_time}ms."
-        )
-        response.headers["x-time-taken"] = str(process_time)
-        response.headers["x-trace-id"] = request.state.trace_id
-        return response
+if settings.PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+app.add_middleware(RequestContextMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 
 async def _log_error_request(
@@ -93,88 +89,59 @@ async def _log_error_request(
         f"({exception_name}) Request details: \n"
         f"{LOG_REQUEST_PREFIX} Trace ID: {trace_id}.\n"
         f"{LOG_REQUEST_PREFIX} Method: {request.method}, URL: {request.url}.\n"
-        f"{LOG_REQUEST_PREFIX} Headers: {request.headers}.\n"
+        f"{LOG_REQUEST_PREFIX} Headers: {redact_headers(request.headers)}.\n"
     )
     logger.exception(exception)
 
 
-@app.exception_handler(RateLimitExceeded)
-async def rate_limit_exceeded_exception_handler(
-    request: Request, exception: RateLimitExceeded
-):
-    await _log_error_request(
-        request, exception, "rate_limit_exceeded_exception_handler"
-    )
-    return JSONResponse(
-        status_code=HTTPStatus.TOO_MANY_REQUESTS,
-        content=json.loads(
-            make_response(
-                request.state.trace_id,
-                data=str(exception),
-                code=StateCode.REQUEST_LIMIT_ERROR,
-            ).model_dump_json(exclude_none=True)
-        ),
-    )
-
-
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, exception: RequestValidationError
 ):
     await _log_error_request(request, exception, "http_validation_exception_handler")
-    return JSONResponse(
+    return make_json_response(
+        request.state.trace_id,
+        data=exception.errors(),
+        code=StateCode.VALIDATION_ERROR,
         status_code=HTTPStatus.BAD_REQUEST,
-        content=json.loads(
-            make_response(
-                request.state.trace_id,
-                data=exception.errors(),
-                code=StateCode.VALIDATION_ERROR,
-            ).model_dump_json(exclude_none=True)
-        ),
+        exclude_none=True,
     )
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exception: HTTPException):
     await _log_error_request(request, exception, "http_exception_handler")
-    exception_response = JSONResponse(
+    return make_json_response(
+        request.state.trace_id,
+        data=None,
+        code=StateCode.UNKNOWN_ERROR,
+        message=exception.detail,
         status_code=exception.status_code,
-        content=make_response(
-            request.state.trace_id,
-            data=None,
-            code=StateCode.INTERNAL_ERROR,
-            message=exception.detail,
-        ).model_dump(exclude_none=True),
+        headers=exception.headers,
+        exclude_none=True,
     )
-    if exception.headers:
-        exception_response.headers.update(exception.headers)
-    return exception_response
 
 
 @app.exception_handler(InternalError)
 async def turing_exception_handler(request: Request, exception: InternalError):
     await _log_error_request(request, exception, "turing_exception_handler")
-    return JSONResponse(
+    return make_json_response(
+        request.state.trace_id,
+        data=exception.data,
+        code=exception.error_code,
+        message=exception.message,
         status_code=exception.http_status_code,
-        content=json.loads(
-            make_response(
-                request.state.trace_id,
-                data=exception.data,
-                code=exception.error_code,
-                message=exception.message,
-            ).model_dump_json(exclude_none=True)
-        ),
+        exclude_none=True,
     )
 
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exception: Exception):
     await _log_error_request(request, exception, "general_exception_handler")
-    return JSONResponse(
+    return make_json_response(
+        request.state.trace_id,
+        data=None,
+        code=StateCode.UNKNOWN_ERROR,
         status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
-        content=make_response(
-            request.state.trace_id,
-            data=None,
-            code=StateCode.UNKNOWN_ERROR,
-        ).model_dump(exclude_none=True),
+        exclude_none=True,
     )
@@ -1,12 +1,13 @@
 from uuid import UUID
 from pydantic import BaseModel
 
-from models.db.user_role import User
+from models.auth import Principal
 
 
 class RequestContext(BaseModel):
-    current_user: User | None = None
+    principal: Principal | None = None
     trace_id: str | None = None
+    wrote: bool = False  # committed any write to the database
 
 
 class BaseDBModelResponse(BaseModel):
@@ -1,6 +1,28 @@
+from uuid import UUID
 from typing_extensions import Annotated
 from pydantic import BaseModel, Field, StringConstraints
 
+from models.permissions import Permission
+
+
+class Principal(BaseModel):
+    """What authorization needs to know about a signed-in user."""
+
+    id: UUID
+    is_active: bool = True
+    is_admin: bool = False
+    permissions: Permission = Permission(0)
+
+    def has_permissions(self, required_permissions: list[Permission] | None) -> bool:
+        return (
+            self.is_admin
+            or not required_permissions
+            or any(
+                permission & self.permissions == permission
+                for permission in required_permissions
+            )
+        )
+
 
 class CreateTokenRequest(BaseModel):
     account: str = Field(min_length=1)
@@ -0,0 +1,30 @@
+from uuid import UUID
+from pydantic import BaseModel
+
+from models.states import StateCode
+
+
+class BulkItemResult(BaseModel):
+    index: int  # of the item in the request
+    id: UUID | None = None
+    code: int = StateCode.SUCCESS
+    message: str = StateCode.SUCCESS.message
+
+    @classmethod
+    def failure(cls, index: int, code: StateCode, message: str | None = None):
+        return cls(index=index, code=code, message=message or code.message)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.code == StateCode.SUCCESS
+
+
+class BulkResponse(BaseModel):
+    items: list[BulkItemResult]
+    succeeded: int
+    failed: int
+
+    @classmethod
+    def from_results(cls, results: list[BulkItemResult]):
+        succeeded = sum(result.succeeded for result in results)
+        return cls(items=results, succeeded=succeeded, failed=len(results) - succeeded)
@@ -3,6 +3,7 @@ from models.db import BaseDBModel, BaseDBModelWithoutId
 from models.permissions import Permission
 from sqlmodel import (
     Field,
+    Index,
     Relationship,
     SQLModel,
     Column,
@@ -40,9 +41,23 @@ class BaseUser(SQLModel):
 
 
 class User(BaseUser, BaseDBModel, table=True):
+    __table_args__ = (
+        Index("ix_user_updated_at_id", "updated_at", "id"),
+        Index(
+            "ix_user_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        {"extend_existing": True},
+    )
     pwd_hash: str | None = Field(default=None)
     is_active: bool = True
     is_admin: bool = False
+    # effective permissions folded from roles, maintained by `services.permissions`
+    permissions: Permission = Field(
+        sa_column=Column(Integer, default=0, server_default="0", nullable=False)
+    )
     profile: dict = Field(sa_column=Column(JSON, default={}))
     roles: list["Role"] = Relationship(link_model=UserRole, back_populates="users")
 
@@ -53,5 +68,21 @@ class BaseRole(SQLModel):
 
 
 class Role(BaseRole, BaseDBModel, table=True):
+    __table_args__ = (
+        Index("ix_role_updated_at_id", "updated_at", "id"),
+        Index(
+            "ix_role_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_role_desc_trgm",
+            "desc",
+            postgresql_using="gin",
+            postgresql_ops={"desc": "gin_trgm_ops"},
+        ),
+        {"extend_existing": True},
+    )
     permissions: Permission = Field(sa_column=Column(Integer, default=0))
     users: list["User"] = Relationship(link_model=UserRole, back_populates="roles")
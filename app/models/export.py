@@ -0,0 +1,16 @@
+from enum import Enum
+from fastapi import Query
+from pydantic import BaseModel
+
+from models.search import SearchMode
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ExportRequest(BaseModel):
+    format: ExportFormat = Query(default=ExportFormat.NDJSON)
+    query: str = Query(default="")
+    search_mode: SearchMode = Query(default=SearchMode.CONTAINS)
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class ImageFormat(str, Enum):
+    JSON = "json"  # a data URI inside the response envelope
+    PNG = "png"  # raw bytes
@@ -0,0 +1,29 @@
+from enum import Enum
+
+from fastapi import Query
+from pydantic import BaseModel
+
+
+class QRCodeFormat(str, Enum):
+    JSON = "json"  # a PNG data URI inside the response envelope
+    PNG = "png"
+    SVG = "svg"  # much cheaper to render than PNG
+
+
+class ErrorCorrection(str, Enum):
+    L = "L"
+    M = "M"
+    Q = "Q"
+    H = "H"
+
+
+class GetQRCodeRequest(BaseModel):
+    url: str = Query(min_length=1, max_length=2048)
+    format: QRCodeFormat = Query(default=QRCodeFormat.JSON)
+    box_size: int = Query(ge=1, le=50, default=10)
+    border: int = Query(ge=0, le=20, default=4)
+    error_correction: ErrorCorrection = Query(default=ErrorCorrection.L)
+
+
+class QRCodeResponse(BaseModel):
+    qr_code: str
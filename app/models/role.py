@@ -1,6 +1,8 @@
+from uuid import UUID
 from fastapi import Query
 from pydantic import BaseModel, Field
 from models import BaseDBModelResponse
+from models.search import SearchMode
 from models.db.user_role import BaseRole
 from models.permissions import Permission
 
@@ -16,10 +18,26 @@ class BaseRoleResponse(BaseRole, BaseDBModelResponse):
 class UpdateRoleRequest(BaseModel):
     desc: str | None = None
     name: str | None = Field(min_length=1, default=None)
-    permissions: int | None = Field(default=0)
+    permissions: int | None = None  # left alone when not given
+
+
+class BulkCreateRoleRequest(BaseModel):
+    items: list[CreateRoleRequest] = Field(min_length=1)
+
+
+class BulkUpdateRoleItem(UpdateRoleRequest):
+    id: UUID
+
+
+class BulkUpdateRoleRequest(BaseModel):
+    items: list[BulkUpdateRoleItem] = Field(min_length=1)
 
 
 class GetRoleRequest(BaseModel):
     page: int = Query(ge=1, default=1)
     size: int = Query(ge=1, default=20)
     query: str = Query(default="")
+    search_mode: SearchMode = Query(default=SearchMode.CONTAINS)
+    # paginate by cursor instead of page when given, pass an empty one to start
+    cursor: str | None = Query(default=None)
+    with_total: bool = Query(default=False)
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SearchMode(str, Enum):
+    CONTAINS = "contains"
+    PREFIX = "prefix"  # ranked, for type-ahead
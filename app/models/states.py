@@ -17,6 +17,7 @@ class StateCode(IntEnum):
     UNKNOWN_ERROR = 1000, "Unknown error", HTTPStatus.INTERNAL_SERVER_ERROR
     VALIDATION_ERROR = 1001, "Validation error", HTTPStatus.UNPROCESSABLE_ENTITY
     REQUEST_LIMIT_ERROR = 1002, "Request limit error", HTTPStatus.TOO_MANY_REQUESTS
+    SERVER_BUSY = 1003, "Server is busy", HTTPStatus.SERVICE_UNAVAILABLE
 
     # Auth, 2xxx
     NOT_AUTHENTICATED = 2000, "Invalid authentication state", HTTPStatus.UNAUTHORIZED
@@ -42,6 +43,7 @@ class StateCode(IntEnum):
         HTTPStatus.CONFLICT,
     )
     USER_BLOCKED = 3004, "User has been blocked", HTTPStatus.LOCKED
+    IMPORT_JOB_NOT_FOUND = 3005, "Import job not found", HTTPStatus.NOT_FOUND
 
 
 class InternalError(Exception):
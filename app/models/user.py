@@ -1,6 +1,8 @@
+from uuid import UUID
 from fastapi import Query
 from pydantic import BaseModel, Field
 from models import BaseDBModelResponse
+from models.search import SearchMode
 from models.db.user_role import BaseUser
 from models.role import BaseRoleResponse
 
@@ -18,17 +20,49 @@ class BaseUserResponse(BaseUser, BaseDBModelResponse):
     roles: list[BaseRoleResponse] = []
 
 
+class UserExportRow(BaseUser, BaseDBModelResponse):
+    is_active: bool
+    is_admin: bool
+    permissions: int = 0
+
+
 class UpdateUserRequest(BaseModel):
     profile: dict | None = None
     name: str | None = Field(min_length=1, default=None)
+    is_active: bool | None = None
+
+
+class BulkCreateUserRequest(BaseModel):
+    items: list[CreateUserRequest] = Field(min_length=1)
+
+
+class BulkUpdateUserItem(UpdateUserRequest):
+    id: UUID
+
+
+class BulkUpdateUserRequest(BaseModel):
+    items: list[BulkUpdateUserItem] = Field(min_length=1)
+
+
+class UserRoleItem(BaseModel):
+    user_id: UUID
+    role_id: UUID
+
+
+class AssignRolesRequest(BaseModel):
+    items: list[UserRoleItem] = Field(min_length=1)
 
 
 class GetUserRequest(BaseModel):
     page: int = Query(ge=1, default=1)
     size: int = Query(ge=1, default=20)
     query: str = Query(default="")
+    search_mode: SearchMode = Query(default=SearchMode.CONTAINS)
+    # paginate by cursor instead of page when given, pass an empty one to start
+    cursor: str | None = Query(default=None)
+    with_total: bool = Query(default=False)
 
 
 class SelfUserResponse(BaseUserResponse):
-    roles: list[BaseRoleResponse] = Field(exclude=True)
+    roles: list[BaseRoleResponse] = Field(exclude=True, default=[])
     permissions: int = 0
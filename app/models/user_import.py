@@ -0,0 +1,28 @@
+from enum import Enum
+from pydantic import BaseModel
+
+
+class ImportStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class ImportRowError(BaseModel):
+    row: int  # line of the file, 1-based, the CSV header is line 1
+    code: int
+    message: str
+
+
+class UserImportJob(BaseModel):
+    id: str
+    status: ImportStatus = ImportStatus.PENDING
+    processed: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: list[ImportRowError] = []
+    errors_truncated: bool = False  # more rows failed than `errors` holds
+    message: str | None = None
+    created_at: int
+    finished_at: int | None = None
@@ -0,0 +1,23 @@
+"""
+Recompute the materialized `User.permissions` of every user from the roles
+they hold, e.g. after editing `user_role` or `role` by hand:
+
+    uv run python -m app.repair_permissions
+
+Cached principals pick the repaired values up once they expire.
+"""
+
+from init_db import create_sync_session
+from services.permissions import build_refresh_permissions_stmt
+from utils.logger import logger
+
+
+def repair():
+    with create_sync_session() as session:
+        repaired = session.execute(build_refresh_permissions_stmt()).rowcount
+        session.commit()
+    logger.info(f"Permissions of {repaired} user(s) repaired.")
+
+
+if __name__ == "__main__":
+    repair()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Response
 from sqlmodel import select
 
 from models.auth import (
@@ -8,14 +8,16 @@ from models.auth import (
     RefreshTokenResponse,
 )
 from models.db.user_role import User
+from models.image import ImageFormat
 from models.states import InternalError, StateCode
 
-from utils import generate_random_code
-from utils.auth import AuthRequired
-from utils.captcha import gen_captcha
-from utils.response import make_response
-from utils.security import create_access_token, create_refresh_token, verify_pwd
-from app_globals import redis_util, limiter
+from utils.auth import AuthRequired, issue_access_token
+from utils.database import db
+from utils.rate_limit import RateLimit
+from utils import to_data_uri
+from utils.response import make_json_response
+from utils.security import create_refresh_token, verify_pwd_async
+from app_globals import captcha_pool, redis_util
 from context_vars import request_context_var
 
 
@@ -24,17 +26,23 @@ router = APIRouter()
 
 @router.post("/tokens")
 async def create_token(create_token_request: CreateTokenRequest):
-    the_user = await select(User).where(User.name == create_token_request.account)
+    the_user = await db.session.scalar(
+        select(User).where(User.name == create_token_request.account)
+    )
     if not the_user:
         raise InternalError(StateCode.USER_NOT_FOUND)
 
-    pwd_matched = verify_pwd(create_token_request.password, the_user.pwd_hash)
+    pwd_matched = await verify_pwd_async(
+        create_token_request.password, the_user.pwd_hash
+    )
     if not pwd_matched:
         raise InternalError(StateCode.NOT_AUTHENTICATED)
+    if not the_user.is_active:
+        raise InternalError(StateCode.USER_BLOCKED)
 
-    return make_response(
+    return make_json_response(
         data=CreateTokenResponse(
-            access_token=create_access_token(the_user.id),
+            access_token=await issue_access_token(the_user.id),
             refresh_token=create_refresh_token(the_user.id),
         )
     )
@@ -42,23 +50,26 @@ async def create_token(create_token_request: CreateTokenRequest):
 
 @router.put("/tokens")
 async def refresh_token(auth: AuthRequired = Depends(AuthRequired)):
-    return make_response(
+    return make_json_response(
         data=RefreshTokenResponse(
-            access_token=create_access_token(auth.current_user.id),
+            access_token=await issue_access_token(auth.principal.id),
         )
     )
 
 
-@router.post("/captchas")
-@limiter.limit("100/minute")
-async def create_captcha(request: Request):
+@router.post("/captchas", dependencies=[Depends(RateLimit("100/minute"))])
+async def create_captcha(format: ImageFormat = Query(default=ImageFormat.JSON)):
     request_ctx = request_context_var.get()
-    random_code = generate_random_code(5)
-    captcha = gen_captcha(random_code)
+    random_code, captcha = await captcha_pool.get()
     await redis_util.set_cache(request_ctx.trace_id, random_code, ex=60)
 
-    return make_response(
+    if format == ImageFormat.PNG:
+        # the captcha is identified by header `x-trace-id` of this response
+        return Response(
+            captcha, media_type="image/png", headers={"cache-control": "no-store"}
+        )
+    return make_json_response(
         data=CaptchaResponse(
-            captcha=captcha,
+            captcha=to_data_uri(captcha),
         )
     )
@@ -0,0 +1,47 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, Request, Response
+from qrcode.exceptions import DataOverflowError
+
+from models.qr_code import GetQRCodeRequest, QRCodeFormat, QRCodeResponse
+from models.states import InternalError, StateCode
+from utils import to_data_uri
+from utils.auth import AuthRequired
+from utils.etag import etag_matches
+from utils.response import make_json_response
+from app_globals import qr_code_cache
+
+
+router = APIRouter(prefix="/qr-codes", dependencies=[Depends(AuthRequired)])
+MEDIA_TYPES = {
+    QRCodeFormat.PNG: "image/png",
+    QRCodeFormat.SVG: "image/svg+xml",
+}
+
+
+@router.get("")
+async def get_qr_code(
+    request: Request, get_qr_code_request: GetQRCodeRequest = Depends()
+):
+    try:
+        digest, qr_code = await qr_code_cache.get(
+            get_qr_code_request.url,
+            box_size=get_qr_code_request.box_size,
+            border=get_qr_code_request.border,
+            error_correction=get_qr_code_request.error_correction,
+            format=get_qr_code_request.format,
+        )
+    except DataOverflowError:
+        # what fits depends on the error correction and the characters of the URL
+        raise InternalError(
+            StateCode.VALIDATION_ERROR,
+            message="The URL is too long for a QR code at this error correction",
+        )
+
+    if media_type := MEDIA_TYPES.get(get_qr_code_request.format):
+        # images are addressed by their content, so the digest is a strong ETag
+        headers = {"cache-control": "private, max-age=86400", "etag": f'"{digest}"'}
+        if etag_matches(request, headers["etag"]):
+            return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+        return Response(qr_code, media_type=media_type, headers=headers)
+    return make_json_response(data=QRCodeResponse(qr_code=to_data_uri(qr_code)))
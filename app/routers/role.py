@@ -1,22 +1,36 @@
+from typing import Sequence
 from uuid import UUID
-from fastapi import APIRouter, Depends
-from fastapi_async_sqlalchemy import db
+from fastapi import APIRouter, Depends, Request
 from fastapi_pagination import Params
 from fastapi_pagination.ext.sqlmodel import paginate
 from sqlalchemy.exc import IntegrityError
-from sqlmodel import or_, select
+from sqlmodel import select
 
-from models.db.user_role import Role
+from app_globals import tiered_cache
+from models.db.user_role import Role, UserRole
 from models.permissions import Permission
+from models.bulk import BulkResponse
+from models.export import ExportRequest
 from models.role import (
     BaseRoleResponse,
+    BulkCreateRoleRequest,
+    BulkUpdateRoleRequest,
     CreateRoleRequest,
     GetRoleRequest,
     UpdateRoleRequest,
 )
+from models.search import SearchMode
 from models.states import InternalError, StateCode
-from utils.auth import AuthRequired
-from utils.response import make_response
+from services.permissions import refresh_user_permissions
+from services.roles import bulk_create_roles, bulk_update_roles, get_role_user_ids
+from utils.auth import AuthRequired, invalidate_principals
+from utils.database import db
+from utils.etag import etag_response, with_etag
+from utils.export import export_response
+from utils.pagination import paginate_by_cursor
+from utils.replica import open_read_session
+from utils.response import make_json_response
+from utils.search import search_filter, search_rank
 
 
 router = APIRouter(
@@ -24,6 +38,10 @@ router = APIRouter(
 )
 
 
+def _to_role_responses(roles: Sequence[Role]) -> list[BaseRoleResponse]:
+    return [BaseRoleResponse.model_validate(role) for role in roles]
+
+
 @router.post("")
 async def create_role(create_role_request: CreateRoleRequest):
     try:
@@ -33,10 +51,49 @@ async def create_role(create_role_request: CreateRoleRequest):
         )
         db.session.add(new_role)
         await db.session.commit()
+        await tiered_cache.invalidate("roles")
+    except IntegrityError as err:
+        if "UniqueViolationError" in str(err):
+            raise InternalError(StateCode.ROLE_REPEAT)
+    return make_json_response(data=BaseRoleResponse.model_validate(obj=new_role))
+
+
+@router.post("/bulk")
+async def create_roles(bulk_create_role_request: BulkCreateRoleRequest):
+    results = await bulk_create_roles(db.session, bulk_create_role_request.items)
+    await db.session.commit()
+    await tiered_cache.invalidate("roles")
+    return make_json_response(data=BulkResponse.from_results(results))
+
+
+# declared ahead of `/{role_id}`, which would take "bulk" for an id
+@router.patch("/bulk")
+async def update_roles(bulk_update_role_request: BulkUpdateRoleRequest):
+    try:
+        results = await bulk_update_roles(db.session, bulk_update_role_request.items)
+        await db.session.commit()
     except IntegrityError as err:
+        # a rename raced with another write, nothing of the request was applied
         if "UniqueViolationError" in str(err):
             raise InternalError(StateCode.ROLE_REPEAT)
-    return make_response(data=BaseRoleResponse.model_validate(obj=new_role))
+        raise
+    role_user_ids = await get_role_user_ids(
+        db.session, [result.id for result in results if result.succeeded]
+    )
+    # principals carry permissions, not role names
+    if permission_role_ids := [
+        item.id
+        for item, result in zip(bulk_update_role_request.items, results)
+        if result.succeeded and item.permissions is not None
+    ]:
+        await invalidate_principals(
+            *await get_role_user_ids(db.session, permission_role_ids)
+        )
+    # users are listed along with their roles
+    await tiered_cache.invalidate(
+        "roles", "users", *[f"user:{user_id}" for user_id in role_user_ids]
+    )
+    return make_json_response(data=BulkResponse.from_results(results))
 
 
 @router.patch("/{role_id}")
@@ -45,28 +102,82 @@ async def update_role(update_role_request: UpdateRoleRequest, role_id: UUID):
         the_role = await db.session.scalar(select(Role).where(Role.id == role_id))
         if not the_role:
             raise InternalError(StateCode.ROLE_NOT_FOUND)
-        for attr in (update_dict := update_role_request.model_dump(exclude_none=True)):
+        update_dict = update_role_request.model_dump(exclude_none=True)
+        permissions_changed = (
+            update_dict.get("permissions", the_role.permissions) != the_role.permissions
+        )
+        for attr in update_dict:
             setattr(the_role, attr, update_dict[attr])
+        if permissions_changed:
+            await db.session.flush()
+            await refresh_user_permissions(db.session, role_ids=[role_id])
         await db.session.commit()
+        role_user_ids = (
+            await db.session.scalars(
+                select(UserRole.user_id).where(UserRole.role_id == role_id)
+            )
+        ).all()
+        # principals carry permissions, not role names
+        if permissions_changed:
+            await invalidate_principals(*role_user_ids)
+        # users are listed along with their roles
+        await tiered_cache.invalidate(
+            "roles", "users", *[f"user:{user_id}" for user_id in role_user_ids]
+        )
     except IntegrityError as err:
         if "UniqueViolationError" in str(err):
             raise InternalError(StateCode.ROLE_REPEAT)
-    return make_response(data=BaseRoleResponse.model_validate(the_role))
+    return make_json_response(data=BaseRoleResponse.model_validate(the_role))
 
 
-@router.get("")
-async def get_roles(get_role_request: GetRoleRequest = Depends()):
-    query_pattern = f"%{get_role_request.query}%"
-    res_paginated = await paginate(
-        db.session,
-        (
-            select(Role).where(
-                or_(Role.name.ilike(query_pattern), Role.desc.ilike(query_pattern))
+@tiered_cache.cached("roles")
+async def _list_roles(get_role_request: GetRoleRequest):
+    stmt = select(Role)
+    order_by = [Role.updated_at.desc()]
+    if query := get_role_request.query:
+        stmt = stmt.where(
+            search_filter(
+                query, Role.name, Role.desc, mode=get_role_request.search_mode
             )
-            if get_role_request.query
-            else select(Role)
-        ).order_by(Role.updated_at.desc()),
-        Params(page=get_role_request.page, size=get_role_request.size),
-        transformer=lambda x: [BaseRoleResponse.model_validate(role) for role in x],
+        )
+        if get_role_request.search_mode == SearchMode.PREFIX:
+            order_by.insert(0, search_rank(query, Role.name, Role.desc).desc())
+    if get_role_request.cursor is not None:
+        res_paginated = await paginate_by_cursor(
+            db.session,
+            stmt,
+            Role,
+            size=get_role_request.size,
+            cursor=get_role_request.cursor,
+            with_total=get_role_request.with_total,
+            transformer=_to_role_responses,
+        )
+    else:
+        res_paginated = await paginate(
+            db.session,
+            stmt.order_by(*order_by),
+            Params(page=get_role_request.page, size=get_role_request.size),
+            transformer=_to_role_responses,
+        )
+    return with_etag(res_paginated)
+
+
+@router.get("")
+async def get_roles(request: Request, get_role_request: GetRoleRequest = Depends()):
+    return etag_response(request, await _list_roles(get_role_request))
+
+
+@router.get("/export")
+async def export_roles(request: Request, export_request: ExportRequest = Depends()):
+    stmt = select(Role).order_by(Role.updated_at.desc(), Role.id.desc())
+    if query := export_request.query:
+        stmt = stmt.where(
+            search_filter(query, Role.name, Role.desc, mode=export_request.search_mode)
+        )
+    return export_response(
+        stmt,
+        BaseRoleResponse,
+        export_request.format,
+        "roles",
+        replica=await open_read_session(request),
     )
-    return make_response(data=res_paginated)
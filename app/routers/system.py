@@ -0,0 +1,61 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends
+
+from context_vars import request_context_var
+from models.permissions import Permission
+from models.states import InternalError, StateCode
+from settings import settings
+from utils.auth import AuthRequired
+from utils.database import db
+from utils.profiling import PROFILE_HEADER, create_profile_token
+from utils.response import make_json_response
+from app_globals import (
+    captcha_pool,
+    engine,
+    pwd_hash_pool,
+    render_pool,
+    replica_router,
+)
+
+
+router = APIRouter(
+    prefix="/system", dependencies=[Depends(AuthRequired(Permission.SYSTEM))]
+)
+
+
+@router.get("/stats")
+async def get_stats():
+    return make_json_response(
+        data={
+            "captcha_pool": captcha_pool.stats(),
+            "database_pool": engine.pool.stats(),
+            "database_sessions": db.stats(),
+            "replica_pools": replica_router.stats(),
+            "pwd_hash_pool": pwd_hash_pool.stats(),
+            "render_pool": render_pool.stats(),
+        }
+    )
+
+
+@router.post("/profile-tokens")
+async def issue_profile_token():
+    """
+    A token profiling the requests sending it in the `x-profile` header,
+    if they are authenticated as the caller, their profiles are saved to
+    `logs/profiles/{trace_id}.json`.
+    """
+    if not settings.PROFILER_ENABLED:
+        raise InternalError(
+            StateCode.UNKNOWN_ERROR,
+            "Profiling is disabled",
+            HTTPStatus.NOT_IMPLEMENTED,
+        )
+    token, expires_at = create_profile_token(request_context_var.get().principal.id)
+    return make_json_response(
+        data={
+            "header": PROFILE_HEADER.decode(),
+            "token": token,
+            "expires_at": expires_at,
+        }
+    )
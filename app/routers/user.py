@@ -1,86 +1,205 @@
+from typing import Sequence
 from uuid import UUID
-from fastapi import APIRouter, Depends
-from fastapi_async_sqlalchemy import db
+from http import HTTPStatus
+from fastapi import APIRouter, Depends, Query, Request, UploadFile
 from fastapi_pagination import Params
 from fastapi_pagination.ext.sqlmodel import paginate
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from sqlmodel import select
 
+from app_globals import tiered_cache
 from models.db.user_role import User
 from models.permissions import ALL_PERMISSIONS, Permission
+from models.search import SearchMode
 from models.states import InternalError, StateCode
+from models.bulk import BulkResponse
+from models.export import ExportFormat, ExportRequest
 from models.user import (
+    AssignRolesRequest,
+    BulkCreateUserRequest,
+    BulkUpdateUserRequest,
     CreateUserRequest,
     BaseUserResponse,
     GetUserRequest,
     SelfUserResponse,
     UpdateUserRequest,
+    UserExportRow,
 )
-from utils.auth import AuthRequired
-from utils.response import make_response
-from utils.security import gen_pwd_hash
+from services.user_import import get_user_import, start_user_import
+from services.users import assign_roles, bulk_create_users, bulk_update_users
+from utils.auth import AuthRequired, invalidate_principals
+from utils.database import db
+from utils.etag import etag_response, with_etag
+from utils.export import export_response
+from utils.pagination import paginate_by_cursor
+from utils.replica import open_read_session
+from utils.response import make_json_response
+from utils.search import search_filter, search_rank
+from utils.security import gen_pwd_hash_async
 from context_vars import request_context_var
 
 
 router = APIRouter(prefix="/users", dependencies=[Depends(AuthRequired)])
 
 
+def _to_user_responses(users: Sequence[User]) -> list[BaseUserResponse]:
+    return [BaseUserResponse.model_validate(user) for user in users]
+
+
 @router.post("", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
 async def create_user(create_user_request: CreateUserRequest):
     try:
         new_user = User(
             name=create_user_request.name,
-            pwd_hash=gen_pwd_hash(create_user_request.pwd),
+            pwd_hash=await gen_pwd_hash_async(create_user_request.pwd),
+            # a new user holds no roles, spares a lazy load when responding
+            roles=[],
         )
         db.session.add(new_user)
         await db.session.commit()
+        await tiered_cache.invalidate("users")
+    except IntegrityError as err:
+        if "UniqueViolationError" in str(err):
+            raise InternalError(StateCode.USER_REPEAT)
+    return make_json_response(data=BaseUserResponse.model_validate(new_user))
+
+
+@router.post("/bulk", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
+async def create_users(bulk_create_user_request: BulkCreateUserRequest):
+    results = await bulk_create_users(db.session, bulk_create_user_request.items)
+    await db.session.commit()
+    await tiered_cache.invalidate("users")
+    return make_json_response(data=BulkResponse.from_results(results))
+
+
+# declared ahead of `/{user_id}`, which would take "bulk" for an id
+@router.patch("/bulk", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
+async def update_users(bulk_update_user_request: BulkUpdateUserRequest):
+    try:
+        results = await bulk_update_users(db.session, bulk_update_user_request.items)
+        await db.session.commit()
     except IntegrityError as err:
+        # a rename raced with another write, nothing of the request was applied
         if "UniqueViolationError" in str(err):
             raise InternalError(StateCode.USER_REPEAT)
-    return make_response(data=BaseUserResponse.model_validate(new_user))
+        raise
+    user_ids = [result.id for result in results if result.succeeded]
+    await invalidate_principals(*user_ids)
+    await tiered_cache.invalidate("users", *[f"user:{user_id}" for user_id in user_ids])
+    return make_json_response(data=BulkResponse.from_results(results))
+
+
+@router.post("/roles", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
+async def assign_user_roles(assign_roles_request: AssignRolesRequest):
+    results = await assign_roles(db.session, assign_roles_request.items)
+    await db.session.commit()
+    user_ids = {result.id for result in results if result.succeeded}
+    await invalidate_principals(*user_ids)
+    await tiered_cache.invalidate("users", *[f"user:{user_id}" for user_id in user_ids])
+    return make_json_response(data=BulkResponse.from_results(results))
 
 
 @router.patch("/{user_id}", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
 async def update_user(update_user_request: UpdateUserRequest, user_id: UUID):
     try:
-        the_user = await db.session.scalar(select(User).where(User.id == user_id))
+        the_user = await db.session.scalar(
+            select(User).options(selectinload(User.roles)).where(User.id == user_id)
+        )
         if not the_user:
             raise InternalError(StateCode.USER_NOT_FOUND)
         for attr in (update_dict := update_user_request.model_dump(exclude_none=True)):
             setattr(the_user, attr, update_dict[attr])
         await db.session.commit()
+        await invalidate_principals(user_id)
+        await tiered_cache.invalidate("users", f"user:{user_id}")
     except IntegrityError as err:
         if "UniqueViolationError" in str(err):
             raise InternalError(StateCode.USER_REPEAT)
-    return make_response(data=BaseUserResponse.model_validate(the_user))
+    return make_json_response(data=BaseUserResponse.model_validate(the_user))
+
+
+@tiered_cache.cached("users")
+async def _list_users(get_user_request: GetUserRequest):
+    # roles of a whole page in one more query, rather than one per user
+    stmt = select(User).options(selectinload(User.roles))
+    order_by = [User.updated_at.desc()]
+    if query := get_user_request.query:
+        stmt = stmt.where(
+            search_filter(query, User.name, mode=get_user_request.search_mode)
+        )
+        if get_user_request.search_mode == SearchMode.PREFIX:
+            order_by.insert(0, search_rank(query, User.name).desc())
+    if get_user_request.cursor is not None:
+        res_paginated = await paginate_by_cursor(
+            db.session,
+            stmt,
+            User,
+            size=get_user_request.size,
+            cursor=get_user_request.cursor,
+            with_total=get_user_request.with_total,
+            transformer=_to_user_responses,
+        )
+    else:
+        res_paginated = await paginate(
+            db.session,
+            stmt.order_by(*order_by),
+            Params(page=get_user_request.page, size=get_user_request.size),
+            transformer=_to_user_responses,
+        )
+    return with_etag(res_paginated)
 
 
 @router.get("", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
-async def get_users(get_user_request: GetUserRequest = Depends()):
-    query_pattern = f"%{get_user_request.query}%"
-    res_paginated = await paginate(
-        db.session,
-        (
-            select(User).where(User.name.ilike(query_pattern))
-            if get_user_request.query
-            else select(User)
-        ).order_by(User.updated_at.desc()),
-        Params(page=get_user_request.page, size=get_user_request.size),
-        transformer=lambda x: [BaseUserResponse.model_validate(user) for user in x],
+async def get_users(request: Request, get_user_request: GetUserRequest = Depends()):
+    return etag_response(request, await _list_users(get_user_request))
+
+
+@router.get("/export", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
+async def export_users(request: Request, export_request: ExportRequest = Depends()):
+    stmt = select(User).order_by(User.updated_at.desc(), User.id.desc())
+    if query := export_request.query:
+        stmt = stmt.where(
+            search_filter(query, User.name, mode=export_request.search_mode)
+        )
+    return export_response(
+        stmt,
+        UserExportRow,
+        export_request.format,
+        "users",
+        replica=await open_read_session(request),
     )
-    return make_response(data=res_paginated)
 
 
-@router.get("/me")
-async def get_self_info():
-    request_ctx = request_context_var.get()
-    await db.session.refresh(request_ctx.current_user, attribute_names=["roles"])
-    current_user = SelfUserResponse.model_validate(request_ctx.current_user)
+@router.post("/imports", dependencies=[Depends(AuthRequired(Permission.SYSTEM))])
+async def import_users(
+    file: UploadFile, format: ExportFormat = Query(default=ExportFormat.NDJSON)
+):
+    """Rows take the shape of `CreateUserRequest`, in the formats of exports."""
+    job = await start_user_import(file, format)
+    return make_json_response(data=job, status_code=HTTPStatus.ACCEPTED)
 
-    if request_ctx.current_user.is_admin:
+
+@router.get(
+    "/imports/{job_id}", dependencies=[Depends(AuthRequired(Permission.SYSTEM))]
+)
+async def get_import_job(job_id: str):
+    if not (job := await get_user_import(job_id)):
+        raise InternalError(StateCode.IMPORT_JOB_NOT_FOUND)
+    return make_json_response(data=job)
+
+
+@tiered_cache.cached("user:{user_id}")
+async def _load_self_info(user_id: UUID) -> dict:
+    the_user = await db.session.get(User, user_id)
+    # `permissions` is materialized on the user, no need to load roles here
+    current_user = SelfUserResponse.model_validate(the_user.model_dump())
+    if the_user.is_admin:
         current_user.permissions = ALL_PERMISSIONS
-    else:
-        for role in current_user.roles:
-            current_user.permissions |= role.permission
+    return with_etag(current_user)
+
 
-    return make_response(data=current_user)
+@router.get("/me")
+async def get_self_info(request: Request):
+    principal = request_context_var.get().principal
+    return etag_response(request, await _load_self_info(principal.id))
@@ -0,0 +1,135 @@
+from itertools import batched
+from typing import Sequence
+from uuid import UUID
+
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.bulk import BulkItemResult
+from models.db import BaseDBModel
+from models.states import InternalError, StateCode
+from settings import settings
+
+# rows per INSERT, keeping well within the bind parameter limit of postgres
+INSERT_BATCH_SIZE = 1000
+
+
+def check_bulk_size(items: Sequence):
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise InternalError(
+            StateCode.VALIDATION_ERROR,
+            f"At most {settings.BULK_MAX_ITEMS} items are allowed per request",
+        )
+
+
+async def claim_names(
+    session: AsyncSession,
+    model: type[BaseDBModel],
+    names: list[str],
+    repeat_code: StateCode,
+    results: list[BulkItemResult | None],
+) -> list[int]:
+    """
+    Fail the pending items whose name repeats an earlier item's or is taken
+    already, returns the indexes of the others.
+    """
+    first_indexes: dict[str, int] = {}
+    for index, name in enumerate(names):
+        if results[index] is not None:
+            continue
+        if name in first_indexes:
+            results[index] = BulkItemResult.failure(index, repeat_code)
+        else:
+            first_indexes[name] = index
+    if first_indexes:
+        for name in await session.scalars(
+            select(model.name).where(model.name.in_(first_indexes))
+        ):
+            index = first_indexes.pop(name)
+            results[index] = BulkItemResult.failure(index, repeat_code)
+    return list(first_indexes.values())
+
+
+async def insert_named(
+    session: AsyncSession,
+    model: type[BaseDBModel],
+    rows: dict[int, BaseDBModel],
+    repeat_code: StateCode,
+    results: list[BulkItemResult | None],
+):
+    """
+    Insert `rows` (by item index) with multi-row `INSERT ... ON CONFLICT DO
+    NOTHING`, the items whose name got taken in the meantime fail.
+    """
+    for indexes in batched(rows, INSERT_BATCH_SIZE):
+        inserted = set(
+            await session.scalars(
+                insert(model)
+                .values([rows[index].model_dump() for index in indexes])
+                .on_conflict_do_nothing(index_elements=[model.name])
+                .returning(model.id)
+            )
+        )
+        for index in indexes:
+            results[index] = (
+                BulkItemResult(index=index, id=rows[index].id)
+                if rows[index].id in inserted
+                else BulkItemResult.failure(index, repeat_code)
+            )
+
+
+async def update_by_id(
+    session: AsyncSession,
+    model: type[BaseDBModel],
+    items: Sequence[BaseModel],
+    not_found_code: StateCode,
+    repeat_code: StateCode,
+) -> list[BulkItemResult]:
+    """
+    Apply the fields set and non-None in `items` to the rows with their `id`,
+    by ORM bulk UPDATE. Unknown ids, repeated ids and names clashing with another
+    row or item fail, leaving the rest to be updated.
+    """
+    results: list[BulkItemResult | None] = [None] * len(items)
+    seen_ids: set[UUID] = set()
+    for index, item in enumerate(items):
+        if item.id in seen_ids:
+            results[index] = BulkItemResult.failure(
+                index, StateCode.VALIDATION_ERROR, "Repeated id"
+            )
+        seen_ids.add(item.id)
+    existing_ids = set(
+        await session.scalars(select(model.id).where(model.id.in_(seen_ids)))
+    )
+
+    name_owners: dict[str, UUID] = {}
+    if new_names := {item.name for item in items if item.name is not None}:
+        name_owners = dict(
+            (
+                await session.execute(
+                    select(model.name, model.id).where(model.name.in_(new_names))
+                )
+            ).all()
+        )
+    values = []
+    for index, item in enumerate(items):
+        if results[index] is not None:
+            continue
+        if item.id not in existing_ids:
+            results[index] = BulkItemResult.failure(index, not_found_code)
+            continue
+        if item.name is not None:
+            if name_owners.setdefault(item.name, item.id) != item.id:
+                results[index] = BulkItemResult.failure(index, repeat_code)
+                continue
+        if update_dict := item.model_dump(
+            exclude_unset=True, exclude_none=True, exclude={"id"}
+        ):
+            values.append({"id": item.id, **update_dict})
+        results[index] = BulkItemResult(index=index, id=item.id)
+
+    if values:
+        await session.execute(update(model), values)
+    return results
@@ -0,0 +1,52 @@
+from uuid import UUID
+
+from sqlalchemy import Update, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.db.user_role import Role, User, UserRole
+
+
+def build_refresh_permissions_stmt(
+    user_ids: list[UUID] | None = None, role_ids: list[UUID] | None = None
+) -> Update:
+    """
+    Build an UPDATE recomputing the materialized `User.permissions`
+    from the roles users hold, touching only rows that have drifted.
+
+    Parameters
+    ----------
+    user_ids:
+        Only refresh these users.
+    role_ids:
+        Only refresh users holding any of these roles.
+    """
+    effective_permissions = (
+        select(func.coalesce(func.bit_or(Role.permissions), 0))
+        .join(UserRole, UserRole.role_id == Role.id)
+        .where(UserRole.user_id == User.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(User)
+        .values(permissions=effective_permissions)
+        .where(User.permissions.is_distinct_from(effective_permissions))
+    )
+    if user_ids is not None:
+        stmt = stmt.where(User.id.in_(user_ids))
+    if role_ids is not None:
+        stmt = stmt.where(
+            User.id.in_(select(UserRole.user_id).where(UserRole.role_id.in_(role_ids)))
+        )
+    return stmt.execution_options(synchronize_session=False)
+
+
+async def refresh_user_permissions(
+    session: AsyncSession,
+    user_ids: list[UUID] | None = None,
+    role_ids: list[UUID] | None = None,
+) -> int:
+    """Recompute `User.permissions`, returns how many users were changed."""
+    result = await session.execute(
+        build_refresh_permissions_stmt(user_ids=user_ids, role_ids=role_ids)
+    )
+    return result.rowcount
@@ -0,0 +1,56 @@
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.bulk import BulkItemResult
+from models.db.user_role import Role, UserRole
+from models.role import BulkUpdateRoleItem, CreateRoleRequest
+from models.states import StateCode
+from services.bulk import check_bulk_size, claim_names, insert_named, update_by_id
+from services.permissions import refresh_user_permissions
+
+
+async def bulk_create_roles(
+    session: AsyncSession, items: list[CreateRoleRequest]
+) -> list[BulkItemResult]:
+    check_bulk_size(items)
+    results: list[BulkItemResult | None] = [None] * len(items)
+    indexes = await claim_names(
+        session, Role, [item.name for item in items], StateCode.ROLE_REPEAT, results
+    )
+    await insert_named(
+        session,
+        Role,
+        {
+            index: Role(name=items[index].name, desc=items[index].desc)
+            for index in indexes
+        },
+        StateCode.ROLE_REPEAT,
+        results,
+    )
+    return results
+
+
+async def bulk_update_roles(
+    session: AsyncSession, items: list[BulkUpdateRoleItem]
+) -> list[BulkItemResult]:
+    check_bulk_size(items)
+    results = await update_by_id(
+        session, Role, items, StateCode.ROLE_NOT_FOUND, StateCode.ROLE_REPEAT
+    )
+    if role_ids := [
+        item.id
+        for item, result in zip(items, results)
+        if result.succeeded and item.permissions is not None
+    ]:
+        await refresh_user_permissions(session, role_ids=role_ids)
+    return results
+
+
+async def get_role_user_ids(session: AsyncSession, role_ids: list[UUID]) -> list[UUID]:
+    return (
+        await session.scalars(
+            select(UserRole.user_id).where(UserRole.role_id.in_(role_ids)).distinct()
+        )
+    ).all()
@@ -0,0 +1,174 @@
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from itertools import islice
+from typing import IO, Iterator
+from uuid import uuid4
+
+from fastapi import UploadFile
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+
+from app_globals import redis_util, tiered_cache
+from models.export import ExportFormat
+from models.states import StateCode
+from models.user import CreateUserRequest
+from models.user_import import ImportRowError, ImportStatus, UserImportJob
+from services.users import bulk_create_users
+from settings import settings
+from utils import current_time_seconds
+from utils.database import db
+from utils.logger import logger
+
+USER_IMPORT_KEY_PREFIX = "user_import:"
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# strong references, the event loop only keeps weak ones to tasks
+_running: set[asyncio.Task] = set()
+
+
+async def start_user_import(upload: UploadFile, format: ExportFormat) -> UserImportJob:
+    """
+    Spool `upload` to a temporary file and import the users in it in the
+    background, the returned job can be polled by `get_user_import`.
+    """
+    job = UserImportJob(id=uuid4().hex, created_at=current_time_seconds())
+    path = await _spool(upload)
+    # from here on `_run` removes the file, until then it's on us
+    try:
+        await _save(job)
+        task = asyncio.create_task(_run(job, path, format))
+    except BaseException:
+        os.unlink(path)
+        raise
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return job
+
+
+async def get_user_import(job_id: str) -> UserImportJob | None:
+    cached = await redis_util.get_cache(USER_IMPORT_KEY_PREFIX + job_id)
+    return None if cached is None else UserImportJob.model_validate_json(cached)
+
+
+async def stop_user_imports():
+    """Cancel the imports still running, they are marked failed."""
+    for task in _running:
+        task.cancel()
+    await asyncio.gather(*_running, return_exceptions=True)
+
+
+async def _spool(upload: UploadFile) -> str:
+    with tempfile.NamedTemporaryFile(prefix="user_import_", delete=False) as spooled:
+        try:
+            while chunk := await upload.read(SPOOL_CHUNK_SIZE):
+                await asyncio.to_thread(spooled.write, chunk)
+        except BaseException:
+            os.unlink(spooled.name)
+            raise
+    return spooled.name
+
+
+async def _save(job: UserImportJob):
+    try:
+        await redis_util.set_cache(
+            USER_IMPORT_KEY_PREFIX + job.id,
+            job.model_dump_json(),
+            ex=settings.USER_IMPORT_STATUS_TTL_SECONDS,
+        )
+    except RedisError as err:
+        logger.warning(f"Failed to save the status of user import {job.id}: {err}")
+
+
+async def _run(job: UserImportJob, path: str, format: ExportFormat):
+    batch_size = min(settings.USER_IMPORT_BATCH_SIZE, settings.BULK_MAX_ITEMS)
+    job.status = ImportStatus.RUNNING
+    await _save(job)
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            rows = _read_rows(file, format)
+            # reading is blocking, so is each batch read off the event loop
+            while batch := await asyncio.to_thread(list, islice(rows, batch_size)):
+                await _import_batch(job, batch)
+                await _save(job)
+        job.status = ImportStatus.SUCCEEDED
+    except asyncio.CancelledError:
+        job.status = ImportStatus.FAILED
+        job.message = "Import was interrupted"
+        raise
+    except (UnicodeDecodeError, csv.Error) as err:
+        job.status = ImportStatus.FAILED
+        job.message = f"Unreadable file: {err}"
+    except Exception:
+        logger.exception(f"User import {job.id} failed")
+        job.status = ImportStatus.FAILED
+        job.message = StateCode.UNKNOWN_ERROR.message
+    finally:
+        job.finished_at = current_time_seconds()
+        await _save(job)
+        os.unlink(path)
+        if job.created:
+            await tiered_cache.invalidate("users")
+
+
+def _read_rows(
+    file: IO[str], format: ExportFormat
+) -> Iterator[tuple[int, dict | ValueError]]:
+    """Rows along with the line of the file they are on, blank lines are skipped."""
+    if format == ExportFormat.CSV:
+        reader = csv.DictReader(file)
+        for row in reader:
+            row.pop(None, None)  # values beyond the header
+            # where the row ends, as quoted values may span lines
+            yield reader.line_num, row
+        return
+    for line_num, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError as err:
+            yield line_num, err
+
+
+async def _import_batch(job: UserImportJob, batch: list[tuple[int, dict | ValueError]]):
+    items: list[CreateUserRequest] = []
+    item_rows: list[int] = []
+    for row, raw in batch:
+        job.processed += 1
+        if isinstance(raw, ValueError):
+            _add_error(job, row, StateCode.VALIDATION_ERROR, str(raw))
+            continue
+        try:
+            items.append(CreateUserRequest.model_validate(raw))
+            item_rows.append(row)
+        except ValidationError as err:
+            _add_error(job, row, StateCode.VALIDATION_ERROR, _describe(err))
+    if not items:
+        return
+
+    async with db():
+        results = await bulk_create_users(db.session, items)
+        await db.session.commit()
+    for row, result in zip(item_rows, results):
+        if result.succeeded:
+            job.created += 1
+        else:
+            _add_error(job, row, result.code, result.message)
+
+
+def _add_error(job: UserImportJob, row: int, code: int, message: str):
+    job.failed += 1
+    if len(job.errors) < settings.USER_IMPORT_MAX_ERRORS:
+        job.errors.append(ImportRowError(row=row, code=code, message=message))
+    else:
+        job.errors_truncated = True
+
+
+def _describe(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+        for error in err.errors()
+    )
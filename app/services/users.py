@@ -0,0 +1,109 @@
+from itertools import batched
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.bulk import BulkItemResult
+from models.db.user_role import Role, User, UserRole
+from models.states import StateCode
+from models.user import BulkUpdateUserItem, CreateUserRequest, UserRoleItem
+from services.bulk import (
+    INSERT_BATCH_SIZE,
+    check_bulk_size,
+    claim_names,
+    insert_named,
+    update_by_id,
+)
+from services.permissions import refresh_user_permissions
+from utils.security import gen_pwd_hashes_async
+
+
+async def bulk_create_users(
+    session: AsyncSession, items: list[CreateUserRequest]
+) -> list[BulkItemResult]:
+    check_bulk_size(items)
+    results: list[BulkItemResult | None] = [None] * len(items)
+    # hashed ahead of the first query, which would leave the connection idle in
+    #   the transaction meanwhile, only names repeated within `items` are skipped
+    first_indexes: dict[str, int] = {}
+    for index, item in enumerate(items):
+        first_indexes.setdefault(item.name, index)
+    pwd_hashes = dict(
+        zip(
+            first_indexes.values(),
+            await gen_pwd_hashes_async(
+                [items[index].pwd for index in first_indexes.values()]
+            ),
+        )
+    )
+    indexes = await claim_names(
+        session, User, [item.name for item in items], StateCode.USER_REPEAT, results
+    )
+    await insert_named(
+        session,
+        User,
+        {
+            index: User(name=items[index].name, pwd_hash=pwd_hashes[index])
+            for index in indexes
+        },
+        StateCode.USER_REPEAT,
+        results,
+    )
+    return results
+
+
+async def bulk_update_users(
+    session: AsyncSession, items: list[BulkUpdateUserItem]
+) -> list[BulkItemResult]:
+    check_bulk_size(items)
+    return await update_by_id(
+        session, User, items, StateCode.USER_NOT_FOUND, StateCode.USER_REPEAT
+    )
+
+
+async def assign_roles(
+    session: AsyncSession, items: list[UserRoleItem]
+) -> list[BulkItemResult]:
+    """
+    Link users to roles, assigning a role a user holds already succeeds too.
+    The results carry the ids of the users.
+    """
+    check_bulk_size(items)
+    user_ids = {item.user_id for item in items}
+    role_ids = {item.role_id for item in items}
+    existing_user_ids = set(
+        await session.scalars(select(User.id).where(User.id.in_(user_ids)))
+    )
+    existing_role_ids = set(
+        await session.scalars(select(Role.id).where(Role.id.in_(role_ids)))
+    )
+
+    results: list[BulkItemResult] = []
+    links: set[tuple[UUID, UUID]] = set()
+    for index, item in enumerate(items):
+        if item.user_id not in existing_user_ids:
+            results.append(BulkItemResult.failure(index, StateCode.USER_NOT_FOUND))
+        elif item.role_id not in existing_role_ids:
+            results.append(BulkItemResult.failure(index, StateCode.ROLE_NOT_FOUND))
+        else:
+            links.add((item.user_id, item.role_id))
+            results.append(BulkItemResult(index=index, id=item.user_id))
+
+    for batch in batched(links, INSERT_BATCH_SIZE):
+        await session.execute(
+            insert(UserRole)
+            .values(
+                [
+                    UserRole(user_id=user_id, role_id=role_id).model_dump()
+                    for user_id, role_id in batch
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+    if links:
+        await refresh_user_permissions(
+            session, user_ids=list({user_id for user_id, _ in links})
+        )
+    return results
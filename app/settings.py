@@ -1,4 +1,5 @@
 import time
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 from utils.logger import logger
@@ -8,14 +9,64 @@ class Settings(BaseSettings):
     ENV: str = "development"
     ADMIN_PWD: str = ""
     API_PREFIX: str = "/api/v1"
+    WEB_WORKERS: int = 4  # worker processes, read by start.sh too
     DATABASE_ECHO: bool = False
-    DATABASE_MAX_OVERFLOW: int = 64
+    # connections all workers may open together, leave room for migrations etc.
+    DATABASE_MAX_CONNECTIONS: int = 80
+    DATABASE_POOL_SIZE: int | None = None  # per worker, derived when not set
+    DATABASE_MAX_OVERFLOW: int | None = None  # per worker, derived when not set
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 10
+    DATABASE_POOL_RECYCLE_SECONDS: int = 60 * 30
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_CONNECT_TIMEOUT_SECONDS: float = 10
+    DATABASE_STATEMENT_TIMEOUT_MS: int = 30 * 1000
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
+    DATABASE_APPLICATION_NAME: str = "fasm"
     POSTGRES_DB_URI: str = ""
     POSTGRES_DB_URI_SYNC: str = ""
+    POSTGRES_REPLICA_URIS: list[str] = []  # read-only routes are spread over these
+    REPLICA_BALANCING: Literal["round_robin", "least_connections"] = "round_robin"
+    REPLICA_STICKY_SECONDS: int = 5  # reads of a user go to the primary after writes
     REDIS_URI: str = ""
+    REDIS_MAX_CONNECTIONS: int = 64
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5
+    REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS: float = 5
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 2  # 8 hour
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 1 week
     SECRET_KEY: str = ""  # used for JWT token signing
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 10
+    PRINCIPAL_CACHE_REDIS_TTL_SECONDS: int = 300  # 0 disables the redis tier
+    # embed permissions into access tokens, so `AuthRequired` skips the database
+    ACCESS_TOKEN_CLAIMS: bool = False
+    SECURITY_VERSION_CACHE_TTL_SECONDS: int = 5
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0  # share of successful requests logged
+    ACCESS_LOG_SLOW_MS: int = 1000  # slower requests are always logged
+    LOG_REDACTED_HEADERS: list[str] = ["authorization", "cookie", "x-api-key"]
+    RATE_LIMIT_TRUSTED_PROXIES: int = 1  # proxies appending to `X-Forwarded-For`
+    RATE_LIMIT_BATCH_SIZE: int = 1  # hits reserved per redis round trip
+    RATE_LIMIT_BATCH_TTL_SECONDS: float = 1
+    BCRYPT_ROUNDS: int = 12
+    PWD_HASH_WORKERS: int = 4
+    PWD_HASH_QUEUE_SIZE: int = 32  # extra calls are refused with a 503
+    RENDER_WORKERS: int = 2  # for captchas & QR codes
+    RENDER_QUEUE_SIZE: int = 64
+    CAPTCHA_POOL_SIZE: int = 32  # pre-rendered captchas per worker, 0 disables it
+    QR_CODE_CACHE_SIZE: int = 1024
+    QR_CODE_CACHE_REDIS_TTL_SECONDS: int = 60 * 60 * 24  # 0 disables the redis tier
+    DATA_CACHE_SIZE: int = 1024
+    DATA_CACHE_TTL_SECONDS: int = 5
+    DATA_CACHE_REDIS_TTL_SECONDS: int = 60  # 0 disables the redis tier
+    BULK_MAX_ITEMS: int = 1000  # per bulk request
+    USER_IMPORT_BATCH_SIZE: int = 500  # rows per transaction, at most BULK_MAX_ITEMS
+    USER_IMPORT_MAX_ERRORS: int = 1000  # row errors kept in the job status
+    USER_IMPORT_STATUS_TTL_SECONDS: int = 60 * 60 * 24
+    METRICS_ENABLED: bool = True  # serves `/metrics`, denied by nginx.conf
+    METRICS_SAMPLE_INTERVAL_SECONDS: float = 1  # of pools & event loop lag
+    PROFILER_ENABLED: bool = True  # for tokens of `/system/profile-tokens`
+    PROFILER_INTERVAL_SECONDS: float = 0.001  # between stack samples
+    PROFILE_TOKEN_EXPIRE_SECONDS: int = 60 * 10
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,42 @@
+import base64
+import json
+from uuid import uuid4
+
+import pytest
+
+from models.states import InternalError, StateCode
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def _encode(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_cursor_round_trip():
+    id = uuid4()
+    assert decode_cursor(encode_cursor(1734567890, id)) == (1734567890, id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+        _encode("[1, 2"),
+        _encode({"updated_at": 1}),
+        _encode([1]),
+        _encode([1, 2]),
+        _encode([1, str(uuid4()), 3]),
+        _encode(["1", str(uuid4())]),
+        _encode([1.5, str(uuid4())]),
+        _encode([True, str(uuid4())]),
+        _encode([-1, str(uuid4())]),
+        _encode([2**64, str(uuid4())]),
+        _encode([1, "not a uuid"]),
+        _encode([1, None]),
+    ],
+)
+def test_malformed_cursor_is_a_validation_error(cursor: str):
+    with pytest.raises(InternalError) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.error_code == StateCode.VALIDATION_ERROR
@@ -0,0 +1,19 @@
+import io
+
+from models.export import ExportFormat
+from services.user_import import _read_rows
+
+
+def test_ndjson_rows_keep_their_line_numbers():
+    file = io.StringIO('{"name": "a"}\n\n   \nnot json\n{"name": "b"}\n')
+    rows = list(_read_rows(file, ExportFormat.NDJSON))
+    assert [line for line, _ in rows] == [1, 4, 5]
+    assert isinstance(rows[1][1], ValueError)
+    assert rows[2][1] == {"name": "b"}
+
+
+def test_csv_rows_keep_their_line_numbers():
+    file = io.StringIO('name,pwd\r\na,x\r\n\r\n"b\r\nc",y\r\nd,z\r\n', newline="")
+    rows = list(_read_rows(file, ExportFormat.CSV))
+    assert [line for line, _ in rows] == [2, 5, 6]
+    assert rows[1][1] == {"name": "b\r\nc", "pwd": "y"}
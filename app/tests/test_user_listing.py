@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from models.db.user_role import Role, User
+from models.user import GetUserRequest
+from routers.user import _list_users
+from utils.database import db
+
+
+def _list_users_counting_queries(users_count: int) -> tuple[dict, int]:
+    """List a page of users, each with two roles, counting the statements run."""
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        sessionmaker = db._sessionmaker
+        db.bind(engine)
+        try:
+            async with db():
+                roles = [Role(name="a"), Role(name="b")]
+                db.session.add_all(
+                    User(name=f"user-{i}", roles=roles) for i in range(users_count)
+                )
+                await db.session.commit()
+
+            statements = []
+            event.listen(
+                engine.sync_engine,
+                "before_cursor_execute",
+                lambda conn, cursor, statement, *args: statements.append(statement),
+            )
+            async with db():
+                # the undecorated loader, as the cache isn't what's tested
+                page = await _list_users.__wrapped__(
+                    GetUserRequest(
+                        page=1,
+                        size=50,
+                        query="",
+                        search_mode="contains",
+                        cursor=None,
+                        with_total=False,
+                    )
+                )
+            return page["data"], len(statements)
+        finally:
+            db._sessionmaker = sessionmaker
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_roles_are_loaded_in_one_query_per_page():
+    few, few_queries = _list_users_counting_queries(2)
+    many, many_queries = _list_users_counting_queries(30)
+
+    assert len(many["items"]) == 30
+    assert all(len(user["roles"]) == 2 for user in many["items"])
+    # count, page and roles, whatever the size of the page
+    assert few_queries == many_queries == 3
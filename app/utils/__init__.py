@@ -1,3 +1,4 @@
+import base64
 import random
 import string
 import time
@@ -11,3 +12,7 @@ def generate_random_code(length=6):
     characters = string.digits
     verification_code = "".join(random.choice(characters) for _ in range(length))
     return verification_code
+
+
+def to_data_uri(content: bytes, media_type: str = "image/png") -> str:
+    return f"data:{media_type};base64," + base64.b64encode(content).decode("utf-8")
@@ -0,0 +1,46 @@
+import random
+from typing import Mapping
+
+from settings import settings
+from utils.logger import logger
+
+REDACTED = "******"
+
+
+def redact_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    redacted_headers = {header.lower() for header in settings.LOG_REDACTED_HEADERS}
+    return {
+        key: REDACTED if key.lower() in redacted_headers else value
+        for key, value in headers.items()
+    }
+
+
+def log_access(method: str, path: str, status_code: int, time_taken: float):
+    """
+    Write one structured record for a handled request.
+
+    Successful ones are sampled by `ACCESS_LOG_SAMPLE_RATE`, while failed and slow
+    ones are always kept. The message is only formatted if some sink takes it.
+    """
+    is_slow = time_taken >= settings.ACCESS_LOG_SLOW_MS
+    if (
+        status_code < 400
+        and not is_slow
+        and random.random() >= settings.ACCESS_LOG_SAMPLE_RATE
+    ):
+        return
+
+    if status_code >= 500:
+        level = "ERROR"
+    elif status_code >= 400 or is_slow:
+        level = "WARNING"
+    else:
+        level = "INFO"
+    logger.log(
+        level,
+        "{method} {path} {status_code} {time_taken}ms",
+        method=method,
+        path=path,
+        status_code=status_code,
+        time_taken=time_taken,
+    )
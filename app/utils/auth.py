@@ -1,24 +1,29 @@
 import time
 from typing import TypeVar
+from uuid import UUID
 import jwt
 from fastapi import Depends, Security
 from fastapi.params import Depends as Dependency
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fastapi_async_sqlalchemy import db
 from sqlmodel import select
 
+from models.auth import Principal
 from models.states import InternalError, StateCode
 from models.db.user_role import User
 from models.permissions import Permission
-from utils.security import verify_jwt
+from utils.database import db
+from utils.security import create_access_token, verify_jwt
 from utils.logger import logger
+from utils.profiling import start_profiling
 from context_vars import request_context_var
+from app_globals import principal_cache, security_versions
+from settings import settings
 
 UUIDStr = TypeVar("UUIDStr", bound=str)
 bearer_token = HTTPBearer(auto_error=False)
 
 
-def verify_token(token: HTTPAuthorizationCredentials) -> UUIDStr:
+def verify_token(token: HTTPAuthorizationCredentials) -> dict:
     """
     Verify a bearer token.
 
@@ -30,13 +35,13 @@ def verify_token(token: HTTPAuthorizationCredentials) -> UUIDStr:
 
     Returns
     -------
-    ID of current user
+    Claims of the token, of which `sub` is ID of current user
     """
     try:
         if not token or token.scheme.lower() != "bearer":
             logger.error("Invalid credentials")
             raise InternalError(error_code=StateCode.NOT_AUTHENTICATED)
-        return verify_jwt(token.credentials).get("sub")
+        return verify_jwt(token.credentials)
     except jwt.ExpiredSignatureError:
         logger.error("Token has been expired")
         raise InternalError(error_code=StateCode.AUTHENTICATION_EXPIRED)
@@ -45,32 +50,102 @@ def verify_token(token: HTTPAuthorizationCredentials) -> UUIDStr:
         raise InternalError(error_code=StateCode.NOT_AUTHENTICATED)
 
 
+async def _load_principal(user_id: UUIDStr) -> Principal | None:
+    # always from the primary, a lagging replica could hand out, and get cached,
+    #   a principal whose blocking or demotion it hasn't replicated yet
+    row = (
+        await db.session.execute(
+            select(User.id, User.is_active, User.is_admin, User.permissions).where(
+                User.id == user_id
+            )
+        )
+    ).one_or_none()
+    return Principal.model_validate(row._mapping) if row else None
+
+
+async def _principal_from_claims(claims: dict) -> Principal | None:
+    """
+    Build the principal from an access token issued with claims,
+    which is only trusted as long as the user's security version hasn't moved on.
+    """
+    if not settings.ACCESS_TOKEN_CLAIMS or "ver" not in claims:
+        return None
+
+    current_version = await security_versions.get(claims["sub"])
+    if current_version is None:
+        return None
+    if current_version != claims["ver"]:
+        logger.error("Token has been revoked")
+        raise InternalError(error_code=StateCode.AUTHENTICATION_EXPIRED)
+    return Principal(
+        id=claims["sub"], is_admin=claims["adm"], permissions=claims["perm"]
+    )
+
+
+async def issue_access_token(user_id: UUID) -> str:
+    """
+    Issue an access token to a user, reloaded from the primary rather than
+    taken from any cache, which may not have caught up with a revocation yet.
+    """
+    # read before the principal, so that a bump in between revokes the token
+    version = None
+    if settings.ACCESS_TOKEN_CLAIMS:
+        version = await security_versions.issue(user_id)
+    principal = await _load_principal(user_id)
+    if not principal:
+        raise InternalError(error_code=StateCode.USER_NOT_FOUND)
+    if not principal.is_active:
+        raise InternalError(error_code=StateCode.USER_BLOCKED)
+
+    if version is None:
+        return create_access_token(principal.id)
+    return create_access_token(
+        principal.id,
+        claims={
+            "perm": int(principal.permissions),
+            "adm": principal.is_admin,
+            "ver": version,
+        },
+    )
+
+
+async def invalidate_principals(*user_ids: UUID | str):
+    """
+    Drop cached principals of some users and revoke their access tokens,
+    should be called whenever their active state or permissions change.
+    """
+    # bumped first, so that a principal loaded before the change and cached
+    #   after it is either refused by the version check or dropped here
+    try:
+        await security_versions.bump(*user_ids)
+    finally:
+        await principal_cache.invalidate(*user_ids)
+
+
 async def authenticate(
     token: HTTPAuthorizationCredentials = Security(bearer_token),
-) -> User:
+) -> Principal:
     st = time.time()
-    user_id = verify_token(token)
+    claims = verify_token(token)
+    user_id = claims.get("sub")
 
     if not user_id:
         raise InternalError(error_code=StateCode.USER_NOT_FOUND)
 
-    current_user = await db.session.scalar(select(User).where(User.id == user_id))
+    principal = await _principal_from_claims(claims)
+    if not principal:
+        principal = await principal_cache.get(user_id, _load_principal)
     request_ctx = request_context_var.get()
-    request_ctx.current_user = current_user
+    request_ctx.principal = principal
     logger.debug(f"Time taken for authenticating: {time.time() - st}s")
 
-    if not current_user:
+    if not principal:
         raise InternalError(error_code=StateCode.USER_NOT_FOUND)
-    if not current_user.is_active:
+    if not principal.is_active:
         raise InternalError(error_code=StateCode.USER_BLOCKED)
 
-    await db.session.refresh(request_ctx.current_user, attribute_names=["wallets"])
-    active_wallets = [
-        wallet for wallet in request_ctx.current_user.wallets if wallet.is_active
-    ]
-    request_ctx.current_wallet = active_wallets[0] if len(active_wallets) else None
-
-    return current_user
+    start_profiling(principal)
+    return principal
 
 
 class AuthRequired:
@@ -83,7 +158,7 @@ class AuthRequired:
     ### or
     @router.get("/foo")
     def foo(auth: AuthRequired = Depends(AuthRequired)):
-        # in which case we can get an object with a useful property `current_user`
+        # in which case we can get an object with a useful property `principal`
         ...
 
     ### and route requires some permissions
@@ -105,9 +180,9 @@ class AuthRequired:
     def __init__(
         self,
         required_permissions: list[Permission] | None = Depends(lambda: None),
-        current_user: User | None = Depends(authenticate),
+        principal: Principal | None = Depends(authenticate),
     ):
-        self.current_user = current_user
+        self.principal = principal
         self.required_permissions = required_permissions
 
         # We use `Depends` to avoid Fastapi from retrieving body (
@@ -130,24 +205,11 @@ class AuthRequired:
 
     async def __call__(
         self,
-        current_user: User = Depends(authenticate),
+        principal: Principal = Depends(authenticate),
     ):  # require some permissions
-        self.current_user = current_user
-        await db.session.refresh(self.current_user, attribute_names=["roles"])
-
-        authorized_permissions = Permission(0)
-        for role in current_user.roles:
-            authorized_permissions |= role.permission or Permission(0)
+        self.principal = principal
 
         # an authorization checking result
-        if current_user.is_admin or (
-            not self.required_permissions
-            or any(
-                [
-                    (permission & authorized_permissions == permission)
-                    for permission in self.required_permissions
-                ]
-            )
-        ):
+        if principal.has_permissions(self.required_permissions):
             return self
         raise InternalError(error_code=StateCode.NOT_AUTHORIZED)
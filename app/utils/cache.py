@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A size-bounded, in-process LRU mapping whose entries expire `ttl` seconds
+    after they were set (never, if `ttl` is None).
+
+    It is not thread-safe, which is fine as long as it's only touched from
+    the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float | None, V]] = OrderedDict()
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def expire(self):
+        """Drop the expired entries, which are otherwise dropped as they're read."""
+        now = time.monotonic()
+        for key in [
+            key
+            for key, (expires_at, _) in self._data.items()
+            if expires_at is not None and expires_at <= now
+        ]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Collapses concurrent calls for the same key into one: while a call for
+    `key` is running, later callers await its outcome instead of calling again.
+    """
+
+    def __init__(self):
+        self._running: dict[K, asyncio.Future] = {}
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        if running := self._running.get(key):
+            return await asyncio.shield(running)
+
+        running = asyncio.get_running_loop().create_future()
+        self._running[key] = running
+        try:
+            value = await fn()
+            running.set_result(value)
+            return value
+        except BaseException as err:
+            running.set_exception(err)
+            running.exception()  # retrieved, waiters (if any) still get raised
+            raise
+        finally:
+            del self._running[key]
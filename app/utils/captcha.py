@@ -1,11 +1,92 @@
-import base64
+import asyncio
+import threading
+import time
+from collections import deque
+
 from captcha.image import ImageCaptcha
 
-CAPTCHA_PREFIX = "data:image/png;base64,"
+from models.states import InternalError
+from utils import generate_random_code, to_data_uri
+from utils.logger import logger
+from utils.worker_pool import BoundedExecutor
+
+CAPTCHA_LENGTH = 5
+REFILL_RATE_WINDOW_SECONDS = 60
+
+_local = threading.local()
+
+
+def render_captcha(chars: str) -> bytes:
+    # `ImageCaptcha` loads its fonts lazily, so keep one per thread
+    if not hasattr(_local, "image_captcha"):
+        _local.image_captcha = ImageCaptcha()
+    return _local.image_captcha.generate(chars).read()
 
 
 def gen_captcha(chars: str):
-    image_captcha = ImageCaptcha()
-    return CAPTCHA_PREFIX + base64.b64encode(
-        image_captcha.generate(chars).read()
-    ).decode("utf-8")
+    return to_data_uri(render_captcha(chars))
+
+
+class CaptchaPool:
+    """
+    Pre-rendered (code, PNG) pairs, refilled in the background on a worker pool,
+    so that handing out a captcha only has to pop one. When it runs dry,
+    captchas are rendered on demand on the worker pool instead.
+    """
+
+    def __init__(self, render_pool: BoundedExecutor, size: int):
+        self.render_pool = render_pool
+        self.size = size
+        self.refilled_total = 0
+        self.rendered_on_demand_total = 0
+        self._queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue(maxsize=size)
+        self._refilled_at: deque[float] = deque()
+        self._refill_task: asyncio.Task | None = None
+
+    async def get(self) -> tuple[str, bytes]:
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            self.rendered_on_demand_total += 1
+            return await self._render()
+
+    async def _render(self) -> tuple[str, bytes]:
+        code = generate_random_code(CAPTCHA_LENGTH)
+        return code, await self.render_pool.run(render_captcha, code)
+
+    async def _refill(self):
+        while True:
+            try:
+                item = await self._render()
+            except InternalError:  # render pool is busy serving requests
+                await asyncio.sleep(0.1)
+                continue
+            except Exception as err:
+                logger.error(f"Failed to render captcha: {err}")
+                await asyncio.sleep(1)
+                continue
+
+            await self._queue.put(item)
+            self.refilled_total += 1
+            self._refilled_at.append(time.monotonic())
+
+    async def start(self):
+        if self.size > 0 and not self._refill_task:
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def stop(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+            self._refill_task = None
+
+    def stats(self) -> dict:
+        window_start = time.monotonic() - REFILL_RATE_WINDOW_SECONDS
+        while self._refilled_at and self._refilled_at[0] < window_start:
+            self._refilled_at.popleft()
+        return {
+            "depth": self._queue.qsize(),
+            "capacity": self.size,
+            "refilled_total": self.refilled_total,
+            "rendered_on_demand_total": self.rendered_on_demand_total,
+            "refill_rate": len(self._refilled_at) / REFILL_RATE_WINDOW_SECONDS,
+        }
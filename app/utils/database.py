@@ -0,0 +1,234 @@
+import bisect
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import AsyncAdaptedQueuePool, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings import settings
+from utils.metrics import DB_POOL_CHECKOUT_DURATION, DB_POOL_TIMEOUTS
+
+# upper bounds, in seconds, of the buckets of checkout latencies
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+
+class LatencyHistogram:
+    """Cumulative counts of observed durations, as Prometheus histograms have."""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def stats(self) -> dict:
+        cumulative, counts = 0, {}
+        for bound, count in zip([*self.buckets, "+Inf"], self._counts):
+            cumulative += count
+            counts[str(bound)] = cumulative
+        return {"buckets": counts, "count": self.count, "sum": self.sum}
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    `AsyncAdaptedQueuePool` timing how long checkouts take, i.e. waiting for
+    a connection to be returned or a new one to be opened.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_latency = LatencyHistogram(CHECKOUT_BUCKETS)
+        self.waiting = 0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            self.waiting -= 1
+            took = time.perf_counter() - started_at
+            self.checkout_latency.observe(took)
+            DB_POOL_CHECKOUT_DURATION.observe(took)
+
+    def recreate(self):
+        # keeps the metrics of the pool being replaced, e.g. by `engine.dispose()`
+        pool = super().recreate()
+        pool.checkout_latency = self.checkout_latency
+        pool.timeouts = self.timeouts
+        return pool
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            "max_overflow": self._max_overflow,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+            "checkout_latency": self.checkout_latency.stats(),
+        }
+
+
+def pool_limits() -> tuple[int, int]:
+    """
+    `pool_size` and `max_overflow` of each worker, unless set explicitly, split
+    `DATABASE_MAX_CONNECTIONS` evenly among the workers, half of their share
+    kept open and half opened on demand.
+    """
+    share = max(1, settings.DATABASE_MAX_CONNECTIONS // max(1, settings.WEB_WORKERS))
+    pool_size = settings.DATABASE_POOL_SIZE or max(1, share // 2)
+    max_overflow = settings.DATABASE_MAX_OVERFLOW
+    if max_overflow is None:
+        max_overflow = max(0, share - pool_size)
+    return pool_size, max_overflow
+
+
+def create_db_engine(uri: str) -> AsyncEngine:
+    pool_size, max_overflow = pool_limits()
+    connect_args = {}
+    if make_url(uri).get_driver_name() == "asyncpg":
+        connect_args = {
+            "timeout": settings.DATABASE_CONNECT_TIMEOUT_SECONDS,
+            # 0 for pgbouncer in transaction mode, which can't keep them
+            "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "application_name": settings.DATABASE_APPLICATION_NAME,
+                "statement_timeout": str(settings.DATABASE_STATEMENT_TIMEOUT_MS),
+            },
+        }
+    return create_async_engine(
+        uri,
+        echo=settings.DATABASE_ECHO,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+class _SessionSlot:
+    """Where the session of a request or `db()` block goes once it's asked for."""
+
+    def __init__(self, sessionmaker: async_sessionmaker):
+        self.sessionmaker = sessionmaker
+        self.session: AsyncSession | None = None
+
+    def get(self) -> AsyncSession:
+        if self.session is None:
+            self.session = self.sessionmaker()
+            _session_stats["opened"] += 1
+        return self.session
+
+    async def close(self):
+        # a later use opens a new session, e.g. a streamed body or background task
+        if self.session is not None:
+            session, self.session = self.session, None
+            await session.close()
+
+
+_slot: ContextVar[_SessionSlot | None] = ContextVar("_db_session_slot", default=None)
+_session_stats = {"scopes": 0, "opened": 0}
+
+
+class _DBMeta(type):
+    _sessionmaker: async_sessionmaker | None = None
+
+    @property
+    def session(cls) -> AsyncSession:
+        """The session of the current request or `db()` block, opened on first use."""
+        if (slot := _slot.get()) is None:
+            raise RuntimeError("No database session scope, use `async with db():`")
+        return slot.get()
+
+
+class db(metaclass=_DBMeta):
+    """
+    `db.session` within requests, which `DBSessionMiddleware` scopes, or
+    within `async with db():` blocks elsewhere, like background jobs.
+    Uncommitted changes are rolled back when the scope ends.
+    """
+
+    @classmethod
+    def bind(cls, engine: AsyncEngine):
+        cls._sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    @classmethod
+    def _open_scope(cls) -> _SessionSlot:
+        if cls._sessionmaker is None:
+            raise RuntimeError("`db` isn't bound to an engine yet")
+        _session_stats["scopes"] += 1
+        return _SessionSlot(cls._sessionmaker)
+
+    async def __aenter__(self):
+        self._scope = db._open_scope()
+        self._token = _slot.set(self._scope)
+        return db
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            await self._scope.close()
+        finally:
+            _slot.reset(self._token)
+
+    @staticmethod
+    def stats() -> dict:
+        """How many scopes were opened, and how many of them needed a session."""
+        return {
+            **_session_stats,
+            "avoided": _session_stats["scopes"] - _session_stats["opened"],
+        }
+
+
+class DBSessionMiddleware:
+    """
+    Scopes a `db.session` to each HTTP request. The session is only opened
+    when first used, so requests that never query take neither a session nor
+    a connection, and it's closed once the response starts, returning its
+    connection to the pool before the body is sent.
+
+    A plain ASGI middleware, like `RequestContextMiddleware`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        slot = db._open_scope()
+        token = _slot.set(slot)
+
+        async def send_closing_session(message: Message):
+            if message["type"] == "http.response.start":
+                await slot.close()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_closing_session)
+        finally:
+            await slot.close()
+            _slot.reset(token)
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from http import HTTPStatus
+from typing import Any
+
+from fastapi import Request, Response
+from pydantic_core import to_jsonable_python
+
+from utils.response import make_json_response
+
+# clients may keep the body, but have to revalidate it before each use
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    A weak ETag of anything JSON-able, weak as it hashes the data rather than
+    the encoded body.
+    """
+    digest = hashlib.sha1(
+        json.dumps(to_jsonable_python(parts), sort_keys=True).encode()
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {"etag": etag, "cache-control": ETAG_CACHE_CONTROL}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison against `If-None-Match`, which may list several tags."""
+    if not (if_none_match := request.headers.get("if-none-match")):
+        return False
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == opaque_tag
+        for candidate in (tag.strip() for tag in if_none_match.split(","))
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=etag_headers(etag))
+
+
+def with_etag(data: Any) -> dict[str, Any]:
+    """
+    `data` along with its ETag, for cached loaders to return, so that the ETag
+    always comes from the very snapshot the body does, however stale it is.
+    """
+    data = to_jsonable_python(data)
+    return {"etag": make_etag(data), "data": data}
+
+
+def etag_response(request: Request, cached: dict[str, Any]) -> Response:
+    """The data of what `with_etag` made, unless the client has it already."""
+    if etag_matches(request, cached["etag"]):
+        return not_modified(cached["etag"])
+    return make_json_response(data=cached["data"], headers=etag_headers(cached["etag"]))
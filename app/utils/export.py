@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.export import ExportFormat
+from utils.database import db
+
+# rows fetched per round trip of the server-side cursor, and written per chunk
+EXPORT_BATCH_SIZE = 1000
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+# spreadsheets evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_response(
+    stmt: Select,
+    row_model: type[BaseModel],
+    format: ExportFormat,
+    filename: str,
+    replica: AsyncSession | None = None,
+) -> StreamingResponse:
+    """
+    Stream what `stmt` selects, one `row_model` per entity, as NDJSON or CSV.
+    Rows are read from a server-side cursor and dropped from the session
+    once written, so memory stays flat however many there are.
+
+    They are read from `replica` when given, it's closed once done.
+    """
+    return StreamingResponse(
+        _export(stmt, row_model, format, replica),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "content-disposition": f'attachment; filename="{filename}.{format.value}"'
+        },
+    )
+
+
+async def _export(
+    stmt: Select,
+    row_model: type[BaseModel],
+    format: ExportFormat,
+    replica: AsyncSession | None,
+) -> AsyncIterator[bytes]:
+    fields = [
+        name for name, field in row_model.model_fields.items() if not field.exclude
+    ]
+    if format == ExportFormat.CSV:
+        yield _encode_csv([fields])
+
+    # the session of the request is closed by the time the body is streamed
+    async with replica or db():
+        session = replica or db.session
+        result = await session.stream_scalars(
+            stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for entities in result.partitions():
+            rows = [row_model.model_validate(entity) for entity in entities]
+            session.expunge_all()
+            if format == ExportFormat.CSV:
+                yield _encode_csv(
+                    [
+                        [_csv_cell(row[name]) for name in fields]
+                        for row in (row.model_dump(mode="json") for row in rows)
+                    ]
+                )
+            else:
+                yield b"".join(row.model_dump_json().encode() + b"\n" for row in rows)
+
+
+def _encode_csv(rows: Sequence[Sequence]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
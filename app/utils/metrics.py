@@ -0,0 +1,185 @@
+import asyncio
+import os
+import time
+from typing import Any
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.logger import logger
+
+# with this set, every worker writes its samples to files in the directory,
+#   which `/metrics` of any worker adds up, see start.sh
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time taken by HTTP requests, till the body is sent",
+    ["method", "route"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum",
+)
+RESPONSES = Counter(
+    "http_responses", "HTTP responses sent", ["method", "route", "status"]
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Round trips to redis, pipelines count as one",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time taken to check out database connections, of all pools",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts", "Checkouts given up on, of all pools"
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections of the database pools, by state",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting",
+    "Checkouts waiting for a connection",
+    ["database"],
+    multiprocess_mode="livesum",
+)
+WORKER_POOL_TASKS = Gauge(
+    "worker_pool_tasks",
+    "Calls running on or queued for the thread pools",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+CAPTCHA_POOL_DEPTH = Gauge(
+    "captcha_pool_depth",
+    "Pre-rendered captchas ready to be served",
+    multiprocess_mode="livesum",
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop wakes up timers",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status and concurrency of HTTP requests, by route
+    template, so that path parameters don't blow up the label values.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # set by FastAPI on the scope passed down, once a route matched
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            REQUEST_DURATION.labels(scope["method"], route).observe(
+                time.perf_counter() - start_time
+            )
+            RESPONSES.labels(scope["method"], route, status).inc()
+
+
+class RuntimeMonitor:
+    """
+    Measures the event loop lag and samples the pools into gauges every
+    `interval` seconds. Gauges of exited workers are dropped by `stop`.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        engines: dict[str, AsyncEngine],
+        worker_pools: dict[str, Any],
+        captcha_pool: Any,
+    ):
+        self.interval = interval
+        self.engines = engines
+        self.worker_pools = worker_pools
+        self.captcha_pool = captcha_pool
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if MULTIPROC_DIR:
+            multiprocess.mark_process_dead(os.getpid())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled_at = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, loop.time() - scheduled_at))
+            try:
+                self.sample()
+            except Exception as err:
+                logger.warning(f"Failed to sample the pools: {err}")
+
+    def sample(self):
+        for database, engine in self.engines.items():
+            stats = engine.pool.stats()
+            for state in ("checked_out", "checked_in", "overflow"):
+                DB_POOL_CONNECTIONS.labels(database, state).set(stats[state])
+            DB_POOL_WAITING.labels(database).set(stats["waiting"])
+        for name, pool in self.worker_pools.items():
+            stats = pool.stats()
+            WORKER_POOL_TASKS.labels(name, "running").set(stats["in_flight"])
+            WORKER_POOL_TASKS.labels(name, "queued").set(stats["queue_depth"])
+        CAPTCHA_POOL_DEPTH.set(self.captcha_pool.stats()["depth"])
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """The samples of all workers, in the Prometheus text format."""
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    # reading the files of every worker is blocking
+    data = await asyncio.to_thread(generate_latest, registry)
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,59 @@
+import time
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from context_vars import request_context_var
+from models import RequestContext
+from utils.access_log import log_access, redact_headers
+from utils.logger import logger
+
+LOG_REQUEST_PREFIX = f"{'-'*4}>"
+
+
+class RequestContextMiddleware:
+    """
+    Assigns every request a trace ID, sets up `request_context_var`,
+    adds headers `x-time-taken` & `x-trace-id` and writes the access log.
+
+    It's a plain ASGI middleware, so unlike `BaseHTTPMiddleware` it neither runs
+    the app in another task nor buffers the body through memory streams.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        trace_id = str(uuid4())
+        # what `request.state.trace_id` reads from
+        scope.setdefault("state", {})["trace_id"] = trace_id
+        request_context_var.set(request_ctx := RequestContext(trace_id=trace_id))
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                process_time = round((time.perf_counter() - start_time) * 1000, 2)
+                log_access(
+                    scope["method"], scope["path"], message["status"], process_time
+                )
+                headers = MutableHeaders(scope=message)
+                headers["x-time-taken"] = str(process_time)
+                headers["x-trace-id"] = trace_id
+                # before the client can see the response and read again
+                if request_ctx.wrote and request_ctx.principal:
+                    await scope["app"].state.replica_router.stick(
+                        request_ctx.principal.id
+                    )
+            await send(message)
+
+        with logger.contextualize(trace_id=trace_id):
+            logger.opt(lazy=True).debug(
+                f"{LOG_REQUEST_PREFIX} Headers: {{headers}}.",
+                headers=lambda: redact_headers(Headers(scope=scope)),
+            )
+            await self.app(scope, receive, send_with_headers)
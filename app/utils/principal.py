@@ -0,0 +1,210 @@
+import asyncio
+import secrets
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from models.auth import Principal
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.redis_util import RedisUtil
+
+PRINCIPAL_KEY_PREFIX = "principal:"
+SECURITY_VERSION_KEY_PREFIX = "security_version:"
+
+# KEYS: the principal, the security version of its user
+# ARGV: the principal, its TTL, the version read before loading it, '' if none
+FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+class PrincipalCache:
+    """
+    Caches `Principal`s in a short-lived in-process LRU, optionally backed by
+    Redis so that all workers share what one of them has loaded.
+
+    The in-process tier is only invalidated in the worker where `invalidate`
+    is called, so its TTL bounds how long other workers may keep a stale entry.
+
+    Loaded principals are only cached if the security version of their user
+    is still the one read before loading them, so a load racing a change of
+    the user can't cache what `invalidate_principals` has just dropped.
+    """
+
+    def __init__(
+        self,
+        redis_util: RedisUtil | None = None,
+        maxsize: int = 10000,
+        ttl: float = 10,
+        redis_ttl: int = 0,
+    ):
+        self.redis_util = redis_util
+        self.redis_ttl = redis_ttl
+        self._local: TTLCache[str, Principal] = TTLCache(maxsize, ttl)
+        if self.redis_enabled:
+            self._fill = redis_util.client.register_script(FILL_SCRIPT)
+
+    @property
+    def redis_enabled(self) -> bool:
+        return self.redis_util is not None and self.redis_ttl > 0
+
+    async def get(
+        self,
+        user_id: UUID | str,
+        loader: Callable[[str], Awaitable[Principal | None]],
+    ) -> Principal | None:
+        """The cached principal of `user_id`, or else the one `loader` loads."""
+        key = str(user_id)
+        if principal := self._local.get(key):
+            return principal
+        if not self.redis_enabled:
+            if principal := await loader(key):
+                self._local.set(key, principal)
+            return principal
+
+        version = None
+        try:
+            cached, version = await self.redis_util.mget_cache(
+                [PRINCIPAL_KEY_PREFIX + key, SECURITY_VERSION_KEY_PREFIX + key]
+            )
+            if cached:
+                principal = Principal.model_validate_json(cached)
+                self._local.set(key, principal)
+                return principal
+            version = version or b""
+        except RedisError as err:
+            logger.warning(f"Failed to read principal {key} from redis: {err}")
+
+        principal = await loader(key)
+        # not cached without the version to check, nor if it has moved on
+        if principal is None or version is None:
+            return principal
+        try:
+            if await self._fill(
+                keys=[PRINCIPAL_KEY_PREFIX + key, SECURITY_VERSION_KEY_PREFIX + key],
+                args=[principal.model_dump_json(), self.redis_ttl, version],
+            ):
+                self._local.set(key, principal)
+        except RedisError as err:
+            logger.warning(f"Failed to write principal {key} to redis: {err}")
+        return principal
+
+    async def invalidate(self, *user_ids: UUID | str):
+        keys = [str(user_id) for user_id in user_ids]
+        for key in keys:
+            self._local.pop(key)
+        if not keys or not self.redis_enabled:
+            return
+
+        try:
+            await self.redis_util.delete_cache(
+                *[PRINCIPAL_KEY_PREFIX + key for key in keys]
+            )
+        except RedisError as err:
+            logger.error(f"Failed to invalidate principals {keys} in redis: {err}")
+
+
+class SecurityVersions:
+    """
+    Per-user counters in Redis, bumped whenever a user's active state or
+    permissions change. Access tokens carrying claims embed the version they were
+    issued at, so bumping it revokes them without reading the user table.
+
+    Counters start at a random epoch rather than 0, and a missing key means
+    the version is unknown, not 0, so that a flushed or evicted key can't make
+    revoked tokens valid again. They expire `redis_ttl` after the last token
+    issued at them, when no token can carry them any more.
+    """
+
+    def __init__(
+        self,
+        redis_util: RedisUtil,
+        maxsize: int = 10000,
+        ttl: float = 5,
+        redis_ttl: int = 60 * 60 * 24,
+        bump_attempts: int = 3,
+    ):
+        self.redis_util = redis_util
+        self.redis_ttl = redis_ttl
+        self.bump_attempts = bump_attempts
+        self._local: TTLCache[str, int] = TTLCache(maxsize, ttl)
+
+    async def get(self, user_id: UUID | str, fresh: bool = False) -> int | None:
+        """
+        Return the current version, or None when it can't be told.
+        `fresh` skips the in-process tier, which may lag bumps made by other workers.
+        """
+        key = str(user_id)
+        if not fresh and (version := self._local.get(key)) is not None:
+            return version
+
+        try:
+            cached = await self.redis_util.get_cache(SECURITY_VERSION_KEY_PREFIX + key)
+        except RedisError as err:
+            logger.warning(f"Failed to read security version of {key}: {err}")
+            return None
+        if cached is None:
+            return None
+        version = int(cached)
+        self._local.set(key, version)
+        return version
+
+    async def issue(self, user_id: UUID | str) -> int | None:
+        """
+        Return the current version to issue a token at, starting the counter if
+        it isn't there, or None when it can't be told.
+        """
+        key = SECURITY_VERSION_KEY_PREFIX + str(user_id)
+        try:
+            async with self.redis_util.pipeline(transaction=True) as pipe:
+                pipe.set(key, _epoch(), nx=True, ex=self.redis_ttl)
+                # outlives the token about to be issued
+                pipe.expire(key, self.redis_ttl)
+                pipe.get(key)
+                *_, version = await pipe.execute()
+        except RedisError as err:
+            logger.warning(f"Failed to read security version of {user_id}: {err}")
+            return None
+        return int(version)
+
+    async def bump(self, *user_ids: UUID | str):
+        """Raises `RedisError` if it keeps failing, as the tokens are still valid."""
+        keys = [str(user_id) for user_id in user_ids]
+        for key in keys:
+            self._local.pop(key)
+        if not keys:
+            return
+
+        for attempt in range(1, self.bump_attempts + 1):
+            try:
+                async with self.redis_util.pipeline(transaction=True) as pipe:
+                    for key in keys:
+                        pipe.set(
+                            SECURITY_VERSION_KEY_PREFIX + key,
+                            _epoch(),
+                            nx=True,
+                            ex=self.redis_ttl,
+                        )
+                        pipe.incr(SECURITY_VERSION_KEY_PREFIX + key)
+                        pipe.expire(SECURITY_VERSION_KEY_PREFIX + key, self.redis_ttl)
+                    await pipe.execute()
+                return
+            except RedisError as err:
+                logger.error(
+                    f"Failed to bump security versions of {keys}, "
+                    f"attempt {attempt}: {err}"
+                )
+                if attempt == self.bump_attempts:
+                    raise
+                await asyncio.sleep(0.1 * attempt)
+
+
+def _epoch() -> int:
+    # below 2 ** 53, so that it survives JSON anywhere
+    return secrets.randbelow(2**48) + 1
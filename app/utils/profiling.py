@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from uuid import UUID
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from context_vars import request_context_var
+from models.auth import Principal
+from models.permissions import Permission
+from settings import settings
+from utils.logger import LOG_PATH, logger
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_PATH = LOG_PATH / "profiles"
+
+
+class _ProfileRun:
+    def __init__(self, principal_id: str):
+        self.principal_id = principal_id
+        self.profiler: Profiler | None = None
+
+
+# set by the middleware for requests with a valid token, till they are authenticated
+_profile_run: ContextVar[_ProfileRun | None] = ContextVar("_profile_run", default=None)
+
+
+def _sign(principal_id: str, expires_at: int) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(),
+        f"profile:{principal_id}:{expires_at}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def create_profile_token(principal_id: UUID) -> tuple[str, int]:
+    """A token for the `x-profile` header of the principal, and when it expires."""
+    expires_at = int(time.time()) + settings.PROFILE_TOKEN_EXPIRE_SECONDS
+    return (
+        f"{principal_id}.{expires_at}.{_sign(str(principal_id), expires_at)}",
+        expires_at,
+    )
+
+
+def verify_profile_token(token: str) -> str | None:
+    """The ID of the principal the token was issued to, if it is valid."""
+    principal_id, _, rest = token.partition(".")
+    expires_at, _, signature = rest.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return None
+    if not hmac.compare_digest(signature, _sign(principal_id, int(expires_at))):
+        return None
+    return principal_id
+
+
+def start_profiling(principal: Principal):
+    """
+    Start profiling the request if it carries a token issued to the principal,
+    which still has `Permission.SYSTEM`. Called once it is authenticated.
+    """
+    run = _profile_run.get()
+    if run is None or run.profiler is not None:
+        return
+    if run.principal_id != str(principal.id) or not principal.has_permissions(
+        [Permission.SYSTEM]
+    ):
+        logger.warning("Ignored a profile token of another or a demoted principal")
+        return
+    run.profiler = Profiler(interval=settings.PROFILER_INTERVAL_SECONDS)
+    run.profiler.start()
+
+
+class ProfilerMiddleware:
+    """
+    Profiles requests carrying a valid `x-profile` token with pyinstrument,
+    from when they are authenticated as the principal it was issued to, and
+    saves the profile as speedscope JSON to `logs/profiles/{trace_id}.json`.
+
+    Requests without the header only pay for looking it up. It must be added
+    before `RequestContextMiddleware`, whose trace ID it uses.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        token = None
+        if scope["type"] == "http":
+            token = next(
+                (value for name, value in scope["headers"] if name == PROFILE_HEADER),
+                None,
+            )
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+        principal_id = verify_profile_token(token.decode("latin-1"))
+        if principal_id is None:
+            logger.warning("Ignored an invalid profile token")
+            await self.app(scope, receive, send)
+            return
+
+        run = _ProfileRun(principal_id)
+        context_token = _profile_run.set(run)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _profile_run.reset(context_token)
+            if run.profiler is not None:
+                run.profiler.stop()
+                request_ctx = request_context_var.get()
+                await _save(run.profiler, PROFILE_PATH / f"{request_ctx.trace_id}.json")
+
+
+async def _save(profiler: Profiler, path: Path):
+    def write():
+        PROFILE_PATH.mkdir(exist_ok=True)
+        path.write_text(profiler.output(SpeedscopeRenderer()))
+
+    # rendering & writing are blocking, and mustn't hide an error of the request
+    try:
+        await asyncio.to_thread(write)
+        logger.info(f"Saved the profile of the request to {path}")
+    except Exception as err:
+        logger.error(f"Failed to save the profile of the request: {err}")
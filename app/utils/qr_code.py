@@ -1,21 +1,130 @@
-import qrcode
-import base64
+import hashlib
+import json
 from io import BytesIO
 
-QR_CODE_PREFIX = "data:image/png;base64,"
+import qrcode
+from qrcode.exceptions import DataOverflowError
+from qrcode.image.svg import SvgPathImage
+from redis.exceptions import RedisError
 
+from models.qr_code import ErrorCorrection, QRCodeFormat
+from utils import to_data_uri
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.redis_util import RedisUtil
+from utils.worker_pool import BoundedExecutor
 
-def url_to_qr(url: str):
+QR_CODE_KEY_PREFIX = "qr_code:"
+ERROR_CORRECTIONS = {
+    ErrorCorrection.L: qrcode.constants.ERROR_CORRECT_L,
+    ErrorCorrection.M: qrcode.constants.ERROR_CORRECT_M,
+    ErrorCorrection.Q: qrcode.constants.ERROR_CORRECT_Q,
+    ErrorCorrection.H: qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+def render_qr_code(
+    url: str,
+    box_size: int = 10,
+    border: int = 4,
+    error_correction: ErrorCorrection = ErrorCorrection.L,
+    format: QRCodeFormat = QRCodeFormat.PNG,
+) -> bytes:
+    is_svg = format == QRCodeFormat.SVG
     qr = qrcode.QRCode(
         version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        error_correction=ERROR_CORRECTIONS[error_correction],
+        box_size=box_size,
+        border=border,
+        image_factory=SvgPathImage if is_svg else None,
     )
     qr.add_data(url)
-    qr.make(fit=True)
+    try:
+        qr.make(fit=True)
+    except ValueError as err:
+        # fitting past the largest version raises this rather than DataOverflowError
+        raise DataOverflowError(str(err)) from err
+    if is_svg:
+        return qr.make_image().to_string()
+
     img = qr.make_image(fill_color="black", back_color="white")
     buffered = BytesIO()
     img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def url_to_qr(url: str):
+    return to_data_uri(render_qr_code(url))
+
+
+def qr_code_digest(
+    url: str,
+    box_size: int,
+    border: int,
+    error_correction: ErrorCorrection,
+    format: QRCodeFormat,
+) -> str:
+    """Digest of everything a QR code image depends on."""
+    return hashlib.sha256(
+        json.dumps(
+            [url, box_size, border, error_correction, format == QRCodeFormat.SVG]
+        ).encode()
+    ).hexdigest()
+
+
+class QRCodeCache:
+    """
+    Content-addressed cache of rendered QR codes,
+    in a size-bounded in-process LRU backed by Redis when `redis_ttl` > 0.
+    """
+
+    def __init__(
+        self,
+        render_pool: BoundedExecutor,
+        redis_util: RedisUtil | None = None,
+        maxsize: int = 1024,
+        redis_ttl: int = 0,
+    ):
+        self.render_pool = render_pool
+        self.redis_util = redis_util
+        self.redis_ttl = redis_ttl
+        self._local: TTLCache[str, bytes] = TTLCache(maxsize)
+
+    @property
+    def redis_enabled(self) -> bool:
+        return self.redis_util is not None and self.redis_ttl > 0
+
+    async def get(
+        self,
+        url: str,
+        box_size: int = 10,
+        border: int = 4,
+        error_correction: ErrorCorrection = ErrorCorrection.L,
+        format: QRCodeFormat = QRCodeFormat.PNG,
+    ) -> tuple[str, bytes]:
+        """Return the digest and image of a QR code, rendering it if not cached."""
+        digest = qr_code_digest(url, box_size, border, error_correction, format)
+        if image := self._local.get(digest):
+            return digest, image
+
+        if self.redis_enabled:
+            try:
+                image = await self.redis_util.get_cache(QR_CODE_KEY_PREFIX + digest)
+            except RedisError as err:
+                logger.warning(f"Failed to read QR code {digest} from redis: {err}")
+            if image:
+                self._local.set(digest, image)
+                return digest, image
 
-    return QR_CODE_PREFIX + base64.b64encode(buffered.getvalue()).decode("utf-8")
+        image = await self.render_pool.run(
+            render_qr_code, url, box_size, border, error_correction, format
+        )
+        self._local.set(digest, image)
+        if self.redis_enabled:
+            try:
+                await self.redis_util.set_cache(
+                    QR_CODE_KEY_PREFIX + digest, image, ex=self.redis_ttl
+                )
+            except RedisError as err:
+                logger.warning(f"Failed to write QR code {digest} to redis: {err}")
+        return digest, image
@@ -0,0 +1,130 @@
+import re
+import time
+
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from models.states import InternalError, StateCode
+from settings import settings
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.redis_util import RedisUtil
+
+RATE_LIMIT_KEY_PREFIX = "rate_limit:"
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 60 * 60 * 24}
+
+# Sliding window counter: hits of the previous fixed window are weighted by how
+# much of it still overlaps the sliding one. Grants up to the requested number
+# of hits atomically and returns how many it granted.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimated = math.floor(previous * (window - elapsed) / window) + current
+local granted = math.min(requested, limit - estimated)
+if granted <= 0 then
+    return 0
+end
+redis.call('INCRBY', KEYS[1], granted)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return granted
+"""
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """Parse a rate like `100/minute` into the limit and the window in seconds."""
+    matched = RATE_PATTERN.match(rate)
+    if not matched:
+        raise ValueError(f"Invalid rate: {rate}")
+    return int(matched.group(1)), PERIODS[matched.group(2)]
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    IP of the client, taking the hop of `X-Forwarded-For` that was appended by
+    the outermost of our own `RATE_LIMIT_TRUSTED_PROXIES` proxies.
+    """
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for and settings.RATE_LIMIT_TRUSTED_PROXIES > 0:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if hops:
+            return hops[max(0, len(hops) - settings.RATE_LIMIT_TRUSTED_PROXIES)]
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimiter:
+    """
+    Rate limiter shared by all workers through Redis.
+
+    With `batch_size` > 1, a worker reserves that many hits of a key per round
+    trip and spends them locally for up to `batch_ttl` seconds, which trades a
+    little precision (unspent hits are lost) for fewer round trips.
+    """
+
+    def __init__(
+        self, redis_util: RedisUtil, batch_size: int = 1, batch_ttl: float = 1
+    ):
+        self.batch_size = max(1, batch_size)
+        self.batch_ttl = batch_ttl
+        self._script = redis_util.client.register_script(SLIDING_WINDOW_SCRIPT)
+        # key -> [hits left], mutated in place to keep the original expiry
+        self._reserved: TTLCache[str, list[int]] = TTLCache(10000, batch_ttl)
+
+    async def hit(self, key: str, limit: int, window: int) -> bool:
+        if (reserved := self._reserved.get(key)) and reserved[0] > 0:
+            reserved[0] -= 1
+            return True
+
+        now = time.time()
+        window_index = int(now // window)
+        try:
+            granted = await self._script(
+                keys=[
+                    f"{RATE_LIMIT_KEY_PREFIX}{key}:{window_index}",
+                    f"{RATE_LIMIT_KEY_PREFIX}{key}:{window_index - 1}",
+                ],
+                args=[
+                    limit,
+                    window * 1000,
+                    int((now - window_index * window) * 1000),
+                    self.batch_size,
+                ],
+            )
+        except RedisError as err:  # rather let requests through than fail them all
+            logger.error(f"Failed to check rate limit of {key}: {err}")
+            return True
+
+        if granted > 1:
+            self._reserved.set(key, [granted - 1])
+        return granted > 0
+
+
+class RateLimit:
+    """
+    @router.post("/foo", dependencies=[Depends(RateLimit("100/minute"))])
+    def foo():
+        ...
+
+    The limiter is taken from `app.state.rate_limiter`.
+    """
+
+    def __init__(self, rate: str, key_func=get_client_ip):
+        self.limit, self.window = parse_rate(rate)
+        self.key_func = key_func
+
+    async def __call__(self, request: Request):
+        route = request.scope.get("route")
+        key = (
+            f"{request.method}:{route.path if route else request.url.path}:"
+            f"{self.key_func(request)}"
+        )
+        rate_limiter: RateLimiter = request.app.state.rate_limiter
+        if not await rate_limiter.hit(key, self.limit, self.window):
+            raise InternalError(
+                StateCode.REQUEST_LIMIT_ERROR,
+                data=f"{self.limit} per {self.window} second(s)",
+            )
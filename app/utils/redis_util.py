@@ -1,10 +1,67 @@
+import json
+import time
+from typing import Any, Awaitable, Callable, Mapping
+
+import msgpack
 import redis.asyncio as redis
+from pydantic_core import to_json, to_jsonable_python
+from redis.asyncio.client import Pipeline
+
+from utils.cache import SingleFlight
+from utils.metrics import REDIS_COMMAND_DURATION
+
+
+class _TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started_at = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels("PIPELINE").observe(
+                time.perf_counter() - started_at
+            )
+
+
+class _TimedRedis(redis.Redis):
+    """`redis.Redis` recording how long its commands take."""
+
+    async def execute_command(self, *args, **options):
+        started_at = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(str(args[0]).upper()).observe(
+                time.perf_counter() - started_at
+            )
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None):
+        return _TimedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
 
 
 class RedisUtil:
 
-    def __init__(self, endpoint: str):
-        self.client = redis.from_url(url=str(endpoint))
+    def __init__(
+        self,
+        endpoint: str,
+        max_connections: int | None = None,
+        socket_timeout: float | None = None,
+        socket_connect_timeout: float | None = None,
+        health_check_interval: int = 0,
+    ):
+        # a blocking pool makes callers wait for a free connection
+        #   instead of failing once `max_connections` are in use
+        self.pool = redis.BlockingConnectionPool.from_url(
+            url=str(endpoint),
+            max_connections=max_connections or 50,
+            timeout=socket_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_connect_timeout,
+            health_check_interval=health_check_interval,
+        )
+        self.client = _TimedRedis(connection_pool=self.pool)
+        self._loading: SingleFlight[str, Any] = SingleFlight()
 
     async def set_cache(self, key: str, value: str, ex: int | None = None, **kwargs):
         await self.client.set(key, value, ex=ex, **kwargs)
@@ -12,5 +69,70 @@ class RedisUtil:
     async def get_cache(self, key: str) -> bytes | None:
         return await self.client.get(key)
 
-    async def delete_cache(self, key: str) -> int:
-        return await self.client.delete(key)
+    async def delete_cache(self, *keys: str) -> int:
+        return await self.client.delete(*keys) if keys else 0
+
+    async def mget_cache(self, keys: list[str]) -> list[bytes | None]:
+        return await self.client.mget(keys) if keys else []
+
+    async def mset_cache(self, mapping: Mapping[str, Any], ex: int | None = None):
+        if not mapping:
+            return
+        if ex is None:
+            await self.client.mset(mapping)
+            return
+        # MSET can't expire keys, so send one SET per key in a single round trip
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+            await pipe.execute()
+
+    def pipeline(self, transaction: bool = False) -> Pipeline:
+        """
+        Commands queued on the pipeline are sent in one round trip:
+        ```
+        async with redis_util.pipeline() as pipe:
+            pipe.incr("foo")
+            pipe.expire("foo", 60)
+            await pipe.execute()
+        ```
+        """
+        return self.client.pipeline(transaction=transaction)
+
+    async def set_json(self, key: str, value: Any, ex: int | None = None):
+        await self.client.set(key, to_json(value), ex=ex)
+
+    async def get_json(self, key: str) -> Any | None:
+        cached = await self.client.get(key)
+        return None if cached is None else json.loads(cached)
+
+    async def set_msgpack(self, key: str, value: Any, ex: int | None = None):
+        await self.client.set(key, msgpack.packb(to_jsonable_python(value)), ex=ex)
+
+    async def get_msgpack(self, key: str) -> Any | None:
+        cached = await self.client.get(key)
+        return None if cached is None else msgpack.unpackb(cached)
+
+    async def get_or_set(
+        self, key: str, loader: Callable[[], Awaitable[Any]], ex: int | None = None
+    ) -> Any:
+        """
+        Read-through of a JSON value: on a miss, `loader` is run and its result
+        cached. Concurrent misses of the same key in this process share one
+        `loader` call rather than all hitting whatever it loads from.
+
+        The result is always in its JSON-decoded form, be it loaded or cached.
+        """
+        cached = await self.get_json(key)
+        if cached is not None:
+            return cached
+
+        async def load():
+            value = to_jsonable_python(await loader())
+            await self.set_json(key, value, ex=ex)
+            return value
+
+        return await self._loading.do(key, load)
+
+    async def close(self):
+        await self.client.aclose()
@@ -0,0 +1,134 @@
+import itertools
+from typing import Literal
+from uuid import UUID
+
+from fastapi import Request
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from context_vars import request_context_var
+from utils.logger import logger
+from utils.redis_util import RedisUtil
+
+READ_PRIMARY_KEY_PREFIX = "read_primary:"
+
+
+class ReplicaRouter:
+    """
+    Spreads reads over read replicas, round-robin or to the one with the
+    fewest connections checked out by this worker.
+
+    Reads of a user who has just written go to the primary for
+    `sticky_seconds`, so they see their own writes despite replication lag.
+    Without replicas, everything goes to the primary at no extra cost.
+    """
+
+    def __init__(
+        self,
+        engines: list[AsyncEngine],
+        redis_util: RedisUtil,
+        balancing: Literal["round_robin", "least_connections"] = "round_robin",
+        sticky_seconds: int = 5,
+    ):
+        self.engines = engines
+        self.redis_util = redis_util
+        self.balancing = balancing
+        self.sticky_seconds = sticky_seconds
+        self._sessionmakers = {
+            engine: async_sessionmaker(engine, expire_on_commit=False)
+            for engine in engines
+        }
+        self._round_robin = itertools.cycle(engines)
+
+    def pick(self) -> AsyncEngine:
+        if self.balancing == "least_connections":
+            return min(self.engines, key=lambda engine: engine.pool.checkedout())
+        return next(self._round_robin)
+
+    async def open_session(
+        self, user_id: UUID | str | None = None
+    ) -> AsyncSession | None:
+        """A session on a replica, or None when reads should go to the primary."""
+        if not self.engines:
+            return None
+        if user_id is not None and await self.reads_primary(user_id):
+            return None
+        return self._sessionmakers[self.pick()]()
+
+    async def reads_primary(self, user_id: UUID | str) -> bool:
+        try:
+            return (
+                await self.redis_util.get_cache(READ_PRIMARY_KEY_PREFIX + str(user_id))
+                is not None
+            )
+        except RedisError as err:
+            logger.warning(f"Failed to tell where {user_id} reads from: {err}")
+            return True
+
+    async def stick(self, user_id: UUID | str):
+        """Send the reads of `user_id` to the primary for a while."""
+        if not self.engines or self.sticky_seconds <= 0:
+            return
+        try:
+            await self.redis_util.set_cache(
+                READ_PRIMARY_KEY_PREFIX + str(user_id), 1, ex=self.sticky_seconds
+            )
+        except RedisError as err:
+            logger.error(f"Failed to stick {user_id} to the primary: {err}")
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "url": engine.url.render_as_string(hide_password=True),
+                **engine.pool.stats(),
+            }
+            for engine in self.engines
+        ]
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+async def open_read_session(request: Request) -> AsyncSession | None:
+    """
+    A replica session for the request, or None to read from the primary.
+
+    Only for reads bypassing the tiered cache, like exports, as its loaders
+    must read from the primary.
+    """
+    principal = request_context_var.get().principal
+    return await request.app.state.replica_router.open_session(
+        principal.id if principal else None
+    )
+
+
+# a commit that wrote anything makes the request sticky to the primary,
+#   which `RequestContextMiddleware` records before the response goes out
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(orm_execute_state: ORMExecuteState):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _on_flush(session: Session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session: Session):
+    request_ctx = request_context_var.get()
+    if session.info.pop("wrote", False) and request_ctx.trace_id:
+        request_ctx.wrote = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session: Session):
+    session.info.pop("wrote", None)
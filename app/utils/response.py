@@ -1,5 +1,7 @@
 from datetime import datetime
-from typing import Generic, TypeVar
+from http import HTTPStatus
+from typing import Generic, Mapping, TypeVar
+from fastapi import Response
 from models.states import StateCode
 from pydantic import BaseModel
 
@@ -35,3 +37,45 @@ def make_response(
         at=datetime.isoformat(datetime.now()),
         message=message or StateCode.SUCCESS.message,
     )
+
+
+class EnvelopeResponse(Response):
+    """
+    Response of a `BaseResponse`, which pydantic-core serializes straight to
+    JSON bytes once, instead of FastAPI encoding it into python objects and
+    then `json.dumps` them again.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: BaseResponse,
+        status_code: int = HTTPStatus.OK,
+        headers: Mapping[str, str] | None = None,
+        exclude_none: bool = False,
+    ):
+        self.exclude_none = exclude_none
+        super().__init__(content, status_code=status_code, headers=headers)
+
+    def render(self, content: BaseResponse) -> bytes:
+        return content.__pydantic_serializer__.to_json(
+            content, exclude_none=self.exclude_none
+        )
+
+
+def make_json_response(
+    trace_id: str | None = None,
+    data: T | None = None,
+    code: int | StateCode | None = None,
+    message: str | None = None,
+    status_code: int = HTTPStatus.OK,
+    headers: Mapping[str, str] | None = None,
+    exclude_none: bool = False,
+) -> EnvelopeResponse:
+    return EnvelopeResponse(
+        make_response(trace_id, data=data, code=code, message=message),
+        status_code=status_code,
+        headers=headers,
+        exclude_none=exclude_none,
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import ColumnElement, func, or_
+
+from models.search import SearchMode
+
+LIKE_ESCAPE = "\\"
+
+
+def escape_like(term: str) -> str:
+    return (
+        term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+
+
+def search_filter(
+    term: str, *columns: ColumnElement, mode: SearchMode = SearchMode.CONTAINS
+) -> ColumnElement:
+    """
+    Case-insensitive match of `term` against any of `columns`,
+    which the `gin_trgm_ops` indexes on them serve in both modes.
+    """
+    pattern = escape_like(term) + "%"
+    if mode == SearchMode.CONTAINS:
+        pattern = "%" + pattern
+    return or_(*[column.ilike(pattern, escape=LIKE_ESCAPE) for column in columns])
+
+
+def search_rank(term: str, *columns: ColumnElement) -> ColumnElement:
+    """How closely the best of `columns` matches `term`, higher is closer."""
+    return func.greatest(*[func.word_similarity(term, column) for column in columns])
@@ -4,14 +4,15 @@ from datetime import datetime, timedelta
 from uuid import UUID
 
 from settings import settings
+from app_globals import pwd_hash_pool
 
 
 JWT_ALGORITHM = "HS256"
 
 
-def _create_jwt(subject: str, expires_minutes: int) -> str:
+def _create_jwt(subject: str, expires_minutes: int, claims: dict | None = None) -> str:
     expire = datetime.now() + timedelta(minutes=expires_minutes)
-    payload = {"exp": expire, "sub": str(subject), "type": "access"}
+    payload = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "access"}
     return jwt.encode(
         payload=payload,
         key=settings.SECRET_KEY,
@@ -19,8 +20,8 @@ def _create_jwt(subject: str, expires_minutes: int) -> str:
     )
 
 
-def create_access_token(user_id: UUID) -> str:
-    return _create_jwt(str(user_id), settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+def create_access_token(user_id: UUID, claims: dict | None = None) -> str:
+    return _create_jwt(str(user_id), settings.ACCESS_TOKEN_EXPIRE_MINUTES, claims)
 
 
 def create_refresh_token(user_id: UUID) -> str:
@@ -41,4 +42,21 @@ def verify_pwd(plain_pwd: str, hashed_pwd: str) -> bool:
 
 def gen_pwd_hash(plain_pwd: str) -> str:
     plain_pwd_bytes = plain_pwd.encode()
-    return bcrypt.hashpw(plain_pwd_bytes, bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(
+        plain_pwd_bytes, bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    ).decode()
+
+
+async def verify_pwd_async(plain_pwd: str, hashed_pwd: str) -> bool:
+    """`verify_pwd` run on `pwd_hash_pool`, keeping bcrypt off the event loop."""
+    return await pwd_hash_pool.run(verify_pwd, plain_pwd, hashed_pwd)
+
+
+async def gen_pwd_hash_async(plain_pwd: str) -> str:
+    """`gen_pwd_hash` run on `pwd_hash_pool`, keeping bcrypt off the event loop."""
+    return await pwd_hash_pool.run(gen_pwd_hash, plain_pwd)
+
+
+async def gen_pwd_hashes_async(plain_pwds: list[str]) -> list[str]:
+    """`gen_pwd_hash` of many passwords, in parallel on `pwd_hash_pool`."""
+    return await pwd_hash_pool.map(gen_pwd_hash, plain_pwds)
@@ -0,0 +1,255 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+from typing import Any, Awaitable, Callable, Iterable
+
+from pydantic_core import to_json, to_jsonable_python
+from redis.exceptions import RedisError
+
+from utils.cache import SingleFlight, TTLCache
+from utils.logger import logger
+from utils.redis_util import RedisUtil
+
+CACHE_KEY_PREFIX = "cache:"
+CACHE_TAG_KEY_PREFIX = "cache_tag:"
+CACHE_TAG_VERSION_KEY_PREFIX = "cache_tag_version:"
+# outlives any load, a version expiring during one would let it fill again
+CACHE_TAG_VERSION_TTL_SECONDS = 60 * 60 * 24
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+# KEYS: the entry, the versions of its tags, then the sets of entries by tag
+# ARGV: the value, its TTL, then the versions read before loading it
+FILL_SCRIPT = """
+local n = (#KEYS - 1) / 2
+for i = 1, n do
+    if (redis.call('GET', KEYS[1 + i]) or '0') ~= ARGV[2 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 1, n do
+    redis.call('SADD', KEYS[1 + n + i], KEYS[1])
+    redis.call('EXPIRE', KEYS[1 + n + i], ARGV[2])
+end
+return 1
+"""
+# KEYS: the sets of entries by tag, then the versions of the tags
+# ARGV: the TTL of versions, the channel and the message to publish
+INVALIDATE_SCRIPT = """
+local n = #KEYS / 2
+local keys = redis.call('SUNION', unpack(KEYS, 1, n))
+for i = 1, #keys, 1000 do
+    redis.call('DEL', unpack(keys, i, math.min(i + 999, #keys)))
+end
+redis.call('DEL', unpack(KEYS, 1, n))
+for i = n + 1, #KEYS do
+    redis.call('INCR', KEYS[i])
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+end
+redis.call('PUBLISH', ARGV[2], ARGV[3])
+"""
+
+
+class TieredCache:
+    """
+    A read-through cache of JSON-able data with an in-process LRU in front
+    of Redis, invalidated by tags.
+
+    Functions decorated by `cached` must only depend on their arguments and
+    the tagged data, their results are returned JSON-decoded, be it computed
+    or cached, so cache what goes into a response, not the response itself.
+
+    Invalidating a tag drops the Redis entries at once, and the in-process
+    ones of every worker by pub/sub, which `start` subscribes to. Should the
+    subscription be lost, the in-process tier is cleared when it's back,
+    until then its TTL bounds how stale it may get.
+
+    Tags also have versions in Redis, which invalidating bumps along with
+    dropping the entries, atomically. Loaded values are only written to Redis
+    if the versions of their tags are still those read before loading, so a
+    load racing a write can't put back what the write has invalidated.
+
+    Load from the primary rather than a replica, a lagging replica could
+    refill the cache with what a write has just invalidated.
+    """
+
+    def __init__(
+        self,
+        redis_util: RedisUtil,
+        maxsize: int = 1024,
+        ttl: float = 5,
+        redis_ttl: int = 60,
+    ):
+        self.redis_util = redis_util
+        self.redis_ttl = redis_ttl
+        # entries remember when they started loading, invalidating a tag stamps
+        #   it with a later tick rather than looking them up
+        self._local: TTLCache[str, tuple[Any, list[str], int]] = TTLCache(maxsize, ttl)
+        # kept as long as the entries they make stale, and no more than
+        #   `maxsize`, beyond which the whole in-process tier is dropped instead
+        self._invalidated_at: TTLCache[str, int] = TTLCache(maxsize, ttl)
+        self._clock = 0
+        self._loading: SingleFlight[str, Any] = SingleFlight()
+        self._subscriber: asyncio.Task | None = None
+        self._fill = redis_util.client.register_script(FILL_SCRIPT)
+        self._invalidate = redis_util.client.register_script(INVALIDATE_SCRIPT)
+
+    def cached(self, *tags: str):
+        """
+        ```
+        @tiered_cache.cached("roles", "user:{user_id}")
+        async def load_something(user_id: UUID, page: int = 1): ...
+        ```
+        Tags are formatted with the arguments of the call, which are also
+        what the entries are keyed on.
+        """
+
+        def decorator(fn: Callable[..., Awaitable[Any]]):
+            signature = inspect.signature(fn)
+            name = f"{fn.__module__}.{fn.__qualname__}"
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = to_jsonable_python(bound.arguments)
+                digest = hashlib.sha1(
+                    json.dumps(arguments, sort_keys=True).encode()
+                ).hexdigest()
+                return await self.get(
+                    f"{CACHE_KEY_PREFIX}{name}:{digest}",
+                    lambda: fn(*args, **kwargs),
+                    [tag.format(**bound.arguments) for tag in tags],
+                )
+
+            return wrapper
+
+        return decorator
+
+    async def get(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Iterable[str] = (),
+    ) -> Any:
+        if (entry := self._local.get(key)) is not None:
+            value, entry_tags, loaded_at = entry
+            if not self._invalidated_since(entry_tags, loaded_at):
+                return value
+
+        tags = list(tags)
+        value, loaded_at = await self._loading.do(
+            key, lambda: self._load_stamped(key, loader, tags)
+        )
+        # not kept if invalidated while loading, it could outlive `_invalidated_at`
+        if not self._invalidated_since(tags, loaded_at):
+            self._local.set(key, (value, tags, loaded_at))
+        return value
+
+    def _invalidated_since(self, tags: list[str], tick: int) -> bool:
+        return any(self._invalidated_at.get(tag, 0) > tick for tag in tags)
+
+    async def _load_stamped(
+        self, key: str, loader: Callable[[], Awaitable[Any]], tags: list[str]
+    ) -> tuple[Any, int]:
+        # taken before loading, so an invalidation during it leaves the entry stale,
+        #   and here, so that callers joining the load get it too
+        loaded_at = self._clock
+        return await self._load(key, loader, tags), loaded_at
+
+    async def _load(
+        self, key: str, loader: Callable[[], Awaitable[Any]], tags: list[str]
+    ) -> Any:
+        versions = None
+        if self.redis_ttl > 0:
+            try:
+                cached, *versions = await self.redis_util.mget_cache(
+                    [key, *[CACHE_TAG_VERSION_KEY_PREFIX + tag for tag in tags]]
+                )
+                if cached is not None:
+                    return json.loads(cached)
+            except RedisError as err:
+                logger.warning(f"Failed to read {key} from redis: {err}")
+
+        value = to_jsonable_python(await loader())
+        # not written without the versions to check, nor if they've moved on
+        if versions is None:
+            return value
+        try:
+            await self._fill(
+                keys=[
+                    key,
+                    *[CACHE_TAG_VERSION_KEY_PREFIX + tag for tag in tags],
+                    *[CACHE_TAG_KEY_PREFIX + tag for tag in tags],
+                ],
+                args=[
+                    to_json(value),
+                    self.redis_ttl,
+                    *[int(version or 0) for version in versions],
+                ],
+            )
+        except RedisError as err:
+            logger.warning(f"Failed to write {key} to redis: {err}")
+        return value
+
+    async def invalidate(self, *tags: str):
+        if not tags:
+            return
+        self._invalidate_local(tags)
+
+        try:
+            await self._invalidate(
+                keys=[
+                    *[CACHE_TAG_KEY_PREFIX + tag for tag in tags],
+                    *[CACHE_TAG_VERSION_KEY_PREFIX + tag for tag in tags],
+                ],
+                args=[
+                    CACHE_TAG_VERSION_TTL_SECONDS,
+                    INVALIDATION_CHANNEL,
+                    json.dumps(tags),
+                ],
+            )
+        except RedisError as err:
+            logger.error(f"Failed to invalidate cache tags {tags}: {err}")
+
+    def _invalidate_local(self, tags: Iterable[str]):
+        self._clock += 1
+        for tag in tags:
+            if len(self._invalidated_at) >= self._invalidated_at.maxsize:
+                self._invalidated_at.expire()
+            if len(self._invalidated_at) >= self._invalidated_at.maxsize:
+                # evicting stamps would make stale entries look fresh
+                self._local.clear()
+                self._invalidated_at.clear()
+            self._invalidated_at.set(tag, self._clock)
+
+    async def start(self):
+        if self._subscriber is None:
+            self._subscriber = asyncio.create_task(self._subscribe())
+
+    async def stop(self):
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            self._subscriber = None
+
+    async def _subscribe(self):
+        while True:
+            try:
+                async with self.redis_util.client.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # whatever was published while unsubscribed is lost
+                    self._local.clear()
+                    while True:
+                        # polled, as a blocking read would hit the socket timeout
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1
+                        )
+                        if message is not None:
+                            self._invalidate_local(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.warning(f"Cache invalidation subscription lost: {err}")
+                await asyncio.sleep(1)
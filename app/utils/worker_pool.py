@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, TypeVar
+
+from models.states import InternalError, StateCode
+
+R = TypeVar("R")
+
+
+class BoundedExecutor:
+    """
+    Runs blocking callables on a dedicated, size-limited thread pool.
+
+    At most `max_workers` calls run at once and at most `max_queue` more may wait
+    for a free worker, any further call is refused right away with
+    `StateCode.SERVER_BUSY` rather than piling up behind the others.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._in_flight = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.max_workers)
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable[..., R], *args) -> R:
+        if self.saturated:
+            raise InternalError(StateCode.SERVER_BUSY)
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, partial(fn, *args)
+            )
+        finally:
+            self._in_flight -= 1
+
+    async def map(self, fn: Callable[..., R], *iterables: Iterable) -> list[R]:
+        """
+        `fn` over the zipped `iterables`, like the builtin `map`. Unlike `run`,
+        the calls wait for a free worker instead of being refused, but no more
+        than `max_workers` of them are submitted at once, so the queue is left
+        to single calls.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        loop = asyncio.get_running_loop()
+
+        async def run_one(args: tuple) -> R:
+            async with semaphore:
+                self._in_flight += 1
+                try:
+                    return await loop.run_in_executor(
+                        self._executor, partial(fn, *args)
+                    )
+                finally:
+                    self._in_flight -= 1
+
+        return await asyncio.gather(*[run_one(args) for args in zip(*iterables)])
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
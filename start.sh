@@ -1,3 +1,6 @@
 #!/bin/bash
 uv run alembic upgrade head
-exec /fasm/.venv/bin/fastapi run --port 80 --host 0.0.0.0 --workers 4
+# where the workers share their metrics, stale files would skew the counters
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+exec /fasm/.venv/bin/fastapi run --port 80 --host 0.0.0.0 --workers "${WEB_WORKERS:-4}"